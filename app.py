@@ -1,28 +1,37 @@
 from flask import Flask
 from flask_cors import CORS
-import os
 
 from config import Config
-from controllers.api import api_bp
-from controllers.web import web_bp
-from services.scanner import init_scheduler
-from controllers.api import api_bp
 
+def create_app():
+    """Crea la aplicación web sin efectos secundarios: ni conexiones, ni hilos, ni logging.
 
+    La comprobación del esquema y la configuración del logging se hacen en los hooks
+    de gunicorn.conf.py (una vez en el máster) o en el arranque de desarrollo.
+    """
+    from controllers.api import api_bp
+    from controllers.web import web_bp
 
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app)
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    CORS(app)
 
-# Registrar blueprints
-app.register_blueprint(web_bp)
-app.register_blueprint(api_bp, url_prefix='/api')
+    # Registrar blueprints
+    app.register_blueprint(web_bp)
+    app.register_blueprint(api_bp, url_prefix='/api')
 
-# Iniciar scheduler directamente (sin esperar a primera request)
-scheduler = init_scheduler()
-scheduler.start()
-print("✅ Programador de tareas iniciado automáticamente")
+    @app.before_first_request
+    def before_first_request():
+        print("✔️ App Flask iniciada correctamente")
 
-@app.before_first_request
-def before_first_request():
-    print("✔️ App Flask iniciada correctamente")
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    from config import configurar_logging
+    from models.esquema import asegurar_esquema
+
+    configurar_logging()
+    asegurar_esquema()
+    app.run()
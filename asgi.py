@@ -0,0 +1,135 @@
+"""Servidor ASGI: las lecturas de la extensión en asíncrono y el resto de la app Flask montada.
+
+    WEB_ASGI=1 gunicorn -c gunicorn.conf.py
+    uvicorn asgi:app
+
+/api/temas?dominio=, /api/competidores-relacionados y GET /api/medios se atienden con
+asyncpg sin ocupar un hilo por petición; devuelven los mismos bytes y cabeceras que las
+vistas de controllers/api.py. /api/eventos espera en el bucle de eventos, así que los
+flujos SSE abiertos no agotan los hilos del worker. Cualquier otra ruta (y /api/temas
+sin dominio) pasa a la aplicación Flask, que corre en un pool de hilos.
+"""
+import gzip
+import json
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from flask.json import JSONEncoder
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags
+
+from app import app as flask_app
+from config import Config
+from controllers.api import GZIP_MIN_BYTES, etag_temas_dominio, medios_eventos
+from models import db_async
+from models.competidor import get_competidores_por_dominio_async
+from models.medio import get_all_medios_async
+from models.tema import formatear_temas, formatear_temas_compacto, get_datos_temas_por_dominio_async
+from services.eventos import DemasiadosSuscriptores, flujo_sse_async, suscribir_async
+
+# flask-cors responde con este origen a todas las rutas de la app Flask
+CABECERAS_CORS = {"Access-Control-Allow-Origin": "*"}
+
+def _cuerpo_json(datos):
+    """Los mismos bytes que jsonify() de Flask con la configuración de la aplicación"""
+    if flask_app.config["JSONIFY_PRETTYPRINT_REGULAR"] or flask_app.debug:
+        formato = {"indent": 2, "separators": (", ", ": ")}
+    else:
+        formato = {"separators": (",", ":")}
+    texto = json.dumps(datos, cls=JSONEncoder, sort_keys=flask_app.config["JSON_SORT_KEYS"],
+                       ensure_ascii=flask_app.config["JSON_AS_ASCII"], **formato)
+    return (texto + "\n").encode("utf-8")
+
+def _respuesta_json(datos, status_code=200):
+    return Response(_cuerpo_json(datos), status_code=status_code,
+                    media_type="application/json", headers=CABECERAS_CORS)
+
+async def temas_dominio(request):
+    """/api/temas?dominio= con el mismo ETag, 304 y gzip que _respuesta_temas_dominio()"""
+    dominio = request.query_params.get("dominio")
+    if not dominio:
+        return None
+    compacto = request.query_params.get("formato") == "compacto"
+    version, filas = await get_datos_temas_por_dominio_async(dominio)
+    usar_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    etag = etag_temas_dominio(dominio, version, compacto, usar_gzip)
+
+    cabeceras = {**CABECERAS_CORS, "ETag": f'"{etag}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if parse_etags(request.headers.get("if-none-match")).contains(etag):
+        return Response(status_code=304, headers=cabeceras)
+
+    cuerpo = _cuerpo_json({"temas": formatear_temas_compacto(filas) if compacto else formatear_temas(filas)})
+    if usar_gzip and len(cuerpo) >= GZIP_MIN_BYTES:
+        cuerpo = gzip.compress(cuerpo, compresslevel=6)
+        cabeceras["Content-Encoding"] = "gzip"
+    return Response(cuerpo, media_type="application/json", headers=cabeceras)
+
+async def competidores_relacionados(request):
+    dominio = request.query_params.get("dominio")
+    if not dominio:
+        return _respuesta_json({"error": "Dominio requerido"}, 400)
+    return _respuesta_json(await get_competidores_por_dominio_async(dominio))
+
+async def listar_medios(request):
+    return _respuesta_json(await get_all_medios_async())
+
+async def eventos_temas(request):
+    """/api/eventos como eventos_temas() de controllers/api.py, hasta EVENTOS_MAX_SUSCRIPTORES"""
+    params = request.query_params
+    try:
+        medio_id = int(params["medio_id"]) if params.get("medio_id") else None
+    except ValueError:
+        medio_id = None
+    medios = await run_in_threadpool(medios_eventos, params.get("dominio"), medio_id, params.get("tipo", ""))
+    try:
+        cola, despertador = suscribir_async(medios)
+    except DemasiadosSuscriptores as e:
+        return _respuesta_json({"error": str(e)}, 503)
+    return StreamingResponse(
+        flujo_sse_async(cola, despertador, params.get("formato") == "compacto"),
+        media_type="text/event-stream",
+        headers={**CABECERAS_CORS, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class _ConRespaldo:
+    """Ruta asíncrona que devuelve None cuando la petición debe atenderla `respaldo`"""
+
+    def __init__(self, vista, respaldo):
+        self.vista = vista
+        self.respaldo = respaldo
+
+    async def __call__(self, scope, receive, send):
+        respuesta = await self.vista(Request(scope, receive))
+        if respuesta is None:
+            await self.respaldo(scope, receive, send)
+        else:
+            await respuesta(scope, receive, send)
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # Un pool por worker, abierto ya dentro de su bucle de eventos
+    await db_async.abrir_pool()
+    try:
+        yield
+    finally:
+        await db_async.cerrar_pool()
+
+def create_app():
+    flask = WSGIMiddleware(flask_app, workers=Config.ASGI_HILOS_WSGI)
+    return Starlette(
+        routes=[
+            # Con el método equivocado la ruta sólo coincide a medias y gana el montaje de Flask
+            Route("/api/temas", _ConRespaldo(temas_dominio, flask), methods=["GET"]),
+            Route("/api/competidores-relacionados", competidores_relacionados, methods=["GET"]),
+            Route("/api/medios", listar_medios, methods=["GET"]),
+            Route("/api/eventos", eventos_temas, methods=["GET"]),
+            Mount("/", app=flask),
+        ],
+        lifespan=ciclo_de_vida
+    )
+
+app = create_app()
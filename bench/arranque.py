@@ -0,0 +1,88 @@
+"""Tiempo de arranque y memoria de los procesos web y de escaneo.
+
+    python -m bench.arranque [--repeticiones 10]
+
+Importa `app` (lo que hace cada worker de gunicorn) y `services.scanner` (worker.py)
+en procesos nuevos y mide el tiempo de importación, la memoria residual máxima y
+qué dependencias pesadas se han cargado. No necesita base de datos: importar la
+aplicación no debe abrir conexiones.
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from bench.ejecutar import DIRECTORIO_RESULTADOS, _commit_actual
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEPENDENCIAS_PESADAS = ("bs4", "lxml", "selectolax", "requests", "apscheduler", "pytz")
+
+_MEDIR = """
+import json, resource, sys, threading, time
+inicio = time.perf_counter()
+import {modulo}
+segundos = time.perf_counter() - inicio
+print(json.dumps({{
+    "segundos": segundos,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modulos": len(sys.modules),
+    "pesadas": [m for m in {pesadas!r} if m in sys.modules],
+    "hilos": threading.active_count()
+}}))
+"""
+
+def medir_importacion(modulo, repeticiones):
+    muestras = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", _MEDIR.format(modulo=modulo, pesadas=DEPENDENCIAS_PESADAS)],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+            env={**os.environ, "DATABASE_URL": os.environ.get("DATABASE_URL", "postgresql:///inexistente")}
+        ).stdout
+        muestras.append(json.loads(salida.strip().splitlines()[-1]))
+    tiempos = [m["segundos"] for m in muestras]
+    return {
+        "mediana_ms": round(statistics.median(tiempos) * 1000, 1),
+        "min_ms": round(min(tiempos) * 1000, 1),
+        "max_ms": round(max(tiempos) * 1000, 1),
+        "rss_mb": round(statistics.median(m["rss_kb"] for m in muestras) / 1024, 1),
+        "modulos": muestras[-1]["modulos"],
+        "dependencias_pesadas": muestras[-1]["pesadas"],
+        "hilos": muestras[-1]["hilos"]
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--salida", default=None, help="fichero JSON de resultados")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for proceso, modulo in (("web", "app"), ("escaner", "services.scanner")):
+        resultados[proceso] = medir_importacion(modulo, args.repeticiones)
+        r = resultados[proceso]
+        print(f"{proceso}: {r['mediana_ms']}ms, {r['rss_mb']}MB, pesadas: {', '.join(r['dependencias_pesadas']) or 'ninguna'}")
+
+    resultado = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "python": sys.version.split()[0],
+        "parametros": vars(args),
+        "arranque": resultados
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS,
+        f"arranque-{datetime.datetime.now():%Y%m%d-%H%M%S}-{resultado['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados en {salida}")
+    return resultado
+
+if __name__ == "__main__":
+    main()
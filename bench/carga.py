@@ -0,0 +1,182 @@
+"""Prueba de carga de los endpoints de la extensión: servidor WSGI (gthread) frente a ASGI.
+
+    python -m bench.carga [--clientes 64] [--segundos 20] [--workers 2]
+
+Arranca gunicorn con gunicorn.conf.py dos veces sobre la misma base de datos
+desechable (bench/postgres.py), una con la app Flask y otra con WEB_ASGI=1, y lanza
+contra cada una `clientes` conexiones concurrentes que piden una mezcla de
+/api/temas?dominio= (compacto, con gzip y If-None-Match como la extensión),
+/api/competidores-relacionados y /api/medios durante `segundos`. Compara peticiones
+por segundo y percentiles de latencia por ruta.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from bench.ejecutar import DIRECTORIO_RESULTADOS, _commit_actual, _percentiles
+from bench.postgres import postgres_temporal
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Peso de cada ruta en la mezcla de peticiones
+MEZCLA = (("temas", 0.7), ("competidores", 0.2), ("medios", 0.1))
+
+def preparar_datos(temas_por_medio):
+    """Medios de MEDIOS_PRENSA con temas sintéticos y relaciones de competencia entre ellos"""
+    from models.competidor import add_competidor
+    from models.medio import get_all_medios, importar_medios, normalizar_dominio
+    from models.tema import guardar_temas
+    from services.medios_prensa import MEDIOS_PRENSA
+
+    importar_medios(MEDIOS_PRENSA)
+    medios = get_all_medios()
+    for medio in medios:
+        guardar_temas(medio["id"], [(f"Tema {n} de {medio['nombre']}", f"{medio['url'].rstrip('/')}/tema/{n}")
+                                    for n in range(temas_por_medio)])
+    propios = [m for m in medios if m["tipo"] == "propio"]
+    # MEDIOS_PRENSA sólo tiene medios propios: cada uno compite con los cinco siguientes
+    for i, propio in enumerate(propios):
+        for competidor in (propios[(i + n) % len(propios)] for n in range(1, 6)):
+            add_competidor(competidor["id"], propio["id"])
+    return sorted({normalizar_dominio(m["url"]) for m in medios}), sorted({normalizar_dominio(m["url"]) for m in propios})
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def arrancar_servidor(asgi, workers, url_bd):
+    puerto = _puerto_libre()
+    entorno = {**os.environ, "DATABASE_URL": url_bd, "PORT": str(puerto), "WEB_CONCURRENCY": str(workers),
+               "WEB_ASGI": "1" if asgi else "0", "FLASK_ENV": "production"}
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{puerto}",
+         "--log-level", "warning"],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{puerto}"
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection(("127.0.0.1", puerto), timeout=1):
+                return proceso, base
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError(f"gunicorn no arrancó en el puerto {puerto}")
+
+def medir_carga(base, dominios, propios, clientes, segundos):
+    import requests
+
+    latencias = {ruta: [] for ruta, _ in MEZCLA}
+    errores = {ruta: 0 for ruta, _ in MEZCLA}
+    lock = threading.Lock()
+    rutas, pesos = zip(*MEZCLA)
+    fin = time.monotonic() + segundos
+
+    def cliente(semilla):
+        aleatorio = random.Random(semilla)
+        sesion = requests.Session()
+        sesion.trust_env = False
+        etags = {}
+        while time.monotonic() < fin:
+            ruta = aleatorio.choices(rutas, pesos)[0]
+            cabeceras = {"Accept-Encoding": "gzip"}
+            if ruta == "temas":
+                dominio = aleatorio.choice(dominios)
+                url, params = f"{base}/api/temas", {"dominio": dominio, "formato": "compacto"}
+                if dominio in etags:
+                    cabeceras["If-None-Match"] = etags[dominio]
+            elif ruta == "competidores":
+                url, params = f"{base}/api/competidores-relacionados", {"dominio": aleatorio.choice(propios)}
+            else:
+                url, params = f"{base}/api/medios", {}
+            inicio = time.perf_counter()
+            try:
+                respuesta = sesion.get(url, params=params, headers=cabeceras, timeout=30)
+                ok = respuesta.status_code in (200, 304)
+                if ruta == "temas" and "ETag" in respuesta.headers:
+                    etags[dominio] = respuesta.headers["ETag"]
+            except Exception:
+                ok = False
+            segundos_peticion = time.perf_counter() - inicio
+            with lock:
+                if ok:
+                    latencias[ruta].append(segundos_peticion)
+                else:
+                    errores[ruta] += 1
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    todas = [s for valores in latencias.values() for s in valores]
+    return {
+        "peticiones": len(todas) + sum(errores.values()),
+        "errores": sum(errores.values()),
+        "peticiones_por_segundo": round(len(todas) / duracion, 1),
+        **_percentiles(todas),
+        "rutas": {ruta: {"peticiones": len(latencias[ruta]), "errores": errores[ruta], **_percentiles(latencias[ruta])}
+                  for ruta, _ in MEZCLA}
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clientes", type=int, default=64, help="conexiones concurrentes")
+    parser.add_argument("--segundos", type=float, default=20)
+    parser.add_argument("--calentamiento", type=float, default=3, help="segundos de carga previa sin medir")
+    parser.add_argument("--workers", type=int, default=2, help="workers de gunicorn en cada servidor")
+    parser.add_argument("--temas-por-medio", type=int, default=40)
+    parser.add_argument("--salida", default=None, help="fichero JSON de resultados")
+    args = parser.parse_args(argv)
+
+    servidores = {}
+    with postgres_temporal() as url:
+        os.environ["DATABASE_URL"] = url
+        from models.esquema import asegurar_esquema
+
+        asegurar_esquema()
+        dominios, propios = preparar_datos(args.temas_por_medio)
+        print(f"{len(dominios)} dominios, {len(propios)} medios propios, {args.clientes} clientes")
+
+        for nombre, asgi in (("wsgi", False), ("asgi", True)):
+            proceso, base = arrancar_servidor(asgi, args.workers, url)
+            try:
+                medir_carga(base, dominios, propios, args.clientes, args.calentamiento)
+                r = servidores[nombre] = medir_carga(base, dominios, propios, args.clientes, args.segundos)
+            finally:
+                proceso.terminate()
+                proceso.wait()
+            print(f"  {nombre}: {r['peticiones_por_segundo']} req/s, p50 {r.get('p50_ms')}ms, "
+                  f"p99 {r.get('p99_ms')}ms, {r['errores']} errores")
+
+    resultado = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "python": sys.version.split()[0],
+        "parametros": vars(args),
+        "carga": servidores
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS,
+        f"carga-{datetime.datetime.now():%Y%m%d-%H%M%S}-{resultado['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados en {salida}")
+    return resultado
+
+if __name__ == "__main__":
+    main()
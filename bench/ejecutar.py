@@ -0,0 +1,283 @@
+"""Benchmarks del escáner y de la API sin salir a internet.
+
+    python -m bench.ejecutar [--latencia 0.2] [--clientes 8] ...
+
+Sirve las portadas de MEDIOS_PRENSA del corpus versionado de bench/fixtures/ (ver
+bench/fixtures.py) desde un proxy local, usa una base de datos PostgreSQL desechable
+(bench/postgres.py) y mide:
+
+- escaneo: medios por segundo de escanear_medios_por_lotes de principio a fin
+- parseo: tiempo de extraer_enlaces por página
+- escritura: filas por segundo de guardar_temas frente a add_or_update_tema
+- api: percentiles de latencia de /api/temas?dominio= con clientes concurrentes
+
+Los resultados se guardan en JSON en bench/resultados/ con la versión del corpus,
+para comparar sólo ejecuciones sobre las mismas portadas.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from bench.postgres import postgres_temporal
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+def _percentiles(valores):
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))] * 1000, 2)
+    return {
+        "p50_ms": p(0.50), "p90_ms": p(0.90), "p95_ms": p(0.95), "p99_ms": p(0.99),
+        "max_ms": round(ordenados[-1] * 1000, 2),
+        "media_ms": round(statistics.mean(ordenados) * 1000, 2)
+    }
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def preparar_medios():
+    """Da de alta MEDIOS_PRENSA por http:// para que el proxy local pueda servirlos"""
+    from models.medio import importar_medios, get_all_medios
+    from services.medios_prensa import MEDIOS_PRENSA
+
+    medios = [{**m, "url": m["url"].replace("https://", "http://", 1)} for m in MEDIOS_PRENSA]
+    importar_medios(medios)
+    urls = {m["url"] for m in medios}
+    return [m for m in get_all_medios() if m["url"] in urls]
+
+def medir_escaneo(medios, concurrencia, rondas):
+    """La primera ronda inserta todos los temas; las siguientes encuentran la misma huella"""
+    from services.scanner import escanear_medios_por_lotes
+
+    resultados = []
+    for ronda in range(1, rondas + 1):
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            resumen = escanear_medios_por_lotes(concurrencia, medios=medios)
+        segundos = time.perf_counter() - inicio
+        resultados.append({
+            "ronda": ronda,
+            "segundos": round(segundos, 3),
+            "medios_por_segundo": round(len(medios) / segundos, 2),
+            "temas_encontrados": resumen["temas_encontrados"],
+            "insertados": resumen["insertados"],
+            "medios_sin_cambios": resumen["medios_sin_cambios"],
+            "etapas": resumen["etapas"],
+            "http": resumen["http"],
+            "bytes": resumen["bytes"]
+        })
+        print(f"  ronda {ronda}: {segundos:.2f}s, {len(medios) / segundos:.1f} medios/s")
+    return resultados
+
+def medir_parseo(medios, paginas, repeticiones):
+    from models.medio import normalizar_dominio
+    from services.extraccion import BACKEND, extraer_enlaces
+    from services.selectores import SELECTORES_PROPIOS
+    from bench.fixtures import selector_de
+
+    por_pagina = []
+    for medio in medios:
+        dominio = normalizar_dominio(medio["url"])
+        html_bytes, grabada = paginas[dominio]
+        html = html_bytes.decode("utf-8", errors="replace")
+        selectores = [selector_de(medio)] + SELECTORES_PROPIOS
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            enlaces = extraer_enlaces(html, selectores)
+            tiempos.append(time.perf_counter() - inicio)
+        por_pagina.append({
+            "dominio": dominio,
+            "grabada": grabada,
+            "kb": round(len(html_bytes) / 1024, 1),
+            "enlaces": max(len(e) for e in enlaces.values()),
+            "mediana_ms": round(statistics.median(tiempos) * 1000, 3)
+        })
+    medianas = [p["mediana_ms"] for p in por_pagina]
+    return {
+        "backend": BACKEND,
+        "media_ms": round(statistics.mean(medianas), 3),
+        "max_ms": max(medianas),
+        "paginas": sorted(por_pagina, key=lambda p: p["mediana_ms"], reverse=True)
+    }
+
+def medir_escritura(iteraciones, temas_por_escaneo, renovacion):
+    """Filas por segundo guardando `iteraciones` escaneos con una fracción `renovacion` de temas nuevos"""
+    from models.medio import add_medio, get_all_medios
+    from models.tema import guardar_temas, add_or_update_tema
+
+    url = f"http://escritura-{int(time.time())}.bench.local/"
+    add_medio("Bench escritura", url, "propio")
+    medio_id = next(m["id"] for m in get_all_medios() if m["url"] == url)
+
+    nuevos_por_escaneo = max(1, int(temas_por_escaneo * renovacion))
+    def temas_de(i):
+        primero = i * nuevos_por_escaneo
+        return [(f"Tema {n}", f"{url}tema/{n}") for n in range(primero, primero + temas_por_escaneo)]
+
+    resultados = {}
+    for nombre, guardar in (
+        ("guardar_temas", lambda i: guardar_temas(medio_id, temas_de(i))),
+        ("add_or_update_tema", lambda i: [add_or_update_tema(medio_id, n, u) for n, u in temas_de(i)]),
+    ):
+        inicio = time.perf_counter()
+        for i in range(iteraciones):
+            guardar(i)
+        segundos = time.perf_counter() - inicio
+        filas = iteraciones * temas_por_escaneo
+        resultados[nombre] = {
+            "segundos": round(segundos, 3),
+            "filas_por_segundo": round(filas / segundos, 1),
+            "escaneos_por_segundo": round(iteraciones / segundos, 2)
+        }
+        print(f"  {nombre}: {filas / segundos:.0f} filas/s")
+    return resultados
+
+def medir_api(app, dominios, clientes, peticiones, compacto):
+    import requests
+    from werkzeug.serving import make_server
+
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}/api/temas"
+
+    latencias = []
+    errores = []
+    lock = threading.Lock()
+
+    def cliente(semilla):
+        aleatorio = random.Random(semilla)
+        sesion = requests.Session()
+        sesion.trust_env = False
+        for _ in range(peticiones):
+            params = {"dominio": aleatorio.choice(dominios)}
+            if compacto:
+                params["formato"] = "compacto"
+            inicio = time.perf_counter()
+            try:
+                ok = sesion.get(base, params=params, timeout=30).ok
+            except Exception:
+                ok = False
+            segundos = time.perf_counter() - inicio
+            with lock:
+                (latencias if ok else errores).append(segundos)
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+    servidor.shutdown()
+
+    resultado = {
+        "clientes": clientes,
+        "peticiones": len(latencias) + len(errores),
+        "errores": len(errores),
+        "peticiones_por_segundo": round((len(latencias) + len(errores)) / segundos, 1),
+        **_percentiles(latencias)
+    }
+    print(f"  p50 {resultado.get('p50_ms')}ms, p99 {resultado.get('p99_ms')}ms, {resultado['peticiones_por_segundo']} req/s")
+    return resultado
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--latencia", type=float, default=0.1, help="segundos hasta las cabeceras en el proxy")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--ancho-banda", type=float, default=None, help="bytes por segundo del cuerpo")
+    parser.add_argument("--limite", type=int, default=None, help="peticiones por host y segundo antes de responder 429")
+    parser.add_argument("--concurrencia", type=int, default=5)
+    parser.add_argument("--rondas", type=int, default=3)
+    parser.add_argument("--repeticiones-parseo", type=int, default=5)
+    parser.add_argument("--escrituras", type=int, default=50, help="escaneos simulados en la prueba de escritura")
+    parser.add_argument("--temas-por-escaneo", type=int, default=30)
+    parser.add_argument("--renovacion", type=float, default=0.2, help="fracción de temas nuevos por escaneo")
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--peticiones", type=int, default=200, help="peticiones por cliente a /api/temas")
+    parser.add_argument("--compacto", action="store_true", help="pedir /api/temas con formato=compacto")
+    parser.add_argument("--salida", default=None, help="fichero JSON de resultados")
+    args = parser.parse_args(argv)
+
+    with postgres_temporal() as url:
+        # Config lee el entorno al importarse: hay que fijarlo antes de cargar la aplicación
+        os.environ["DATABASE_URL"] = url
+        os.environ.setdefault("SCAN_INTERVALO_HOST", "0")
+        os.environ["SCAN_CONCURRENCIA"] = str(args.concurrencia)
+        os.environ.setdefault("DB_POOL_MAX", str(max(10, args.clientes + 2)))
+
+        from app import app
+        from bench.fixtures import cargar_paginas, version_corpus
+        from bench.stub import ServidorPortadas
+        from models.esquema import asegurar_esquema
+        from models.medio import normalizar_dominio
+        from services.http_pool import get_sesion
+        logging.basicConfig(level=logging.WARNING)
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+        asegurar_esquema()
+
+        medios = preparar_medios()
+        paginas = cargar_paginas(medios)
+        stub = ServidorPortadas(
+            {dominio: html for dominio, (html, _) in paginas.items()},
+            latencia=args.latencia, jitter=args.jitter,
+            ancho_banda=args.ancho_banda, limite_por_segundo=args.limite
+        )
+        get_sesion().proxies = {"http": stub.iniciar()}
+        grabadas = sum(1 for _, grabada in paginas.values() if grabada)
+        print(f"{len(medios)} medios, {grabadas} portadas grabadas y {len(medios) - grabadas} sintéticas")
+
+        try:
+            print("Escaneo")
+            escaneo = medir_escaneo(medios, args.concurrencia, args.rondas)
+            print("Parseo")
+            parseo = medir_parseo(medios, paginas, args.repeticiones_parseo)
+            print(f"  {parseo['media_ms']}ms por página ({parseo['backend']})")
+            print("Escritura")
+            escritura = medir_escritura(args.escrituras, args.temas_por_escaneo, args.renovacion)
+            print("API /api/temas")
+            api = medir_api(app, [normalizar_dominio(m["url"]) for m in medios],
+                            args.clientes, args.peticiones, args.compacto)
+        finally:
+            stub.detener()
+
+    resultado = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "python": sys.version.split()[0],
+        "parametros": vars(args),
+        "corpus": version_corpus(),
+        "proxy": stub.estadisticas,
+        "escaneo": escaneo,
+        "parseo": parseo,
+        "escritura": escritura,
+        "api": api
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{resultado['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados en {salida}")
+    return resultado
+
+if __name__ == "__main__":
+    main()
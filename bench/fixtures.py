@@ -0,0 +1,173 @@
+"""Corpus versionado de portadas de los medios de MEDIOS_PRENSA para los benchmarks.
+
+    python -m bench.fixtures               # graba las portadas actuales
+    python -m bench.fixtures --sinteticas  # congela una sintética para cada medio sin grabar
+
+Las portadas se guardan recortadas (sin scripts, estilos, comentarios ni SVG y con
+RECORTE_MAX_BYTES como mucho) y comprimidas en bench/fixtures/, que va en el
+repositorio para que los resultados sean comparables entre ejecuciones y máquinas.
+bench/fixtures/indice.json lleva la versión del corpus y el origen y sha256 de cada
+página; cualquier cambio en el corpus sube la versión. Un medio sin página en el
+corpus se sirve con una sintética con la estructura de cabecera que espera su selector.
+"""
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+
+from models.medio import normalizar_dominio
+from services.extraccion import contenedor_de_selector
+from services.selectores import SELECTORES_POR_DOMINIO
+
+DIRECTORIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+INDICE = os.path.join(DIRECTORIO, "indice.json")
+
+# Tamaño máximo de una portada recortada; la cabecera con los temas va al principio
+RECORTE_MAX_BYTES = 300 * 1024
+
+_RECORTABLES = re.compile(
+    rb"<script\b.*?</script\s*>|<style\b.*?</style\s*>|<svg\b.*?</svg\s*>|<!--.*?-->|<noscript\b.*?</noscript\s*>",
+    re.IGNORECASE | re.DOTALL
+)
+
+def ruta_fixture(dominio):
+    return os.path.join(DIRECTORIO, f"{dominio}.html.gz")
+
+def selector_de(medio):
+    dominio = normalizar_dominio(medio['url'])
+    semilla = next((s for clave, s in SELECTORES_POR_DOMINIO.items() if clave in dominio), None)
+    return medio.get('selector') or semilla or ".tags a"
+
+def recortar(html):
+    """Quita de la portada lo que no afecta a la extracción y la corta en RECORTE_MAX_BYTES
+    tras el último cierre de etiqueta"""
+    html = _RECORTABLES.sub(b"", html)
+    if len(html) > RECORTE_MAX_BYTES:
+        html = html[:html.rfind(b">", 0, RECORTE_MAX_BYTES) + 1]
+    return html
+
+def cargar_indice():
+    if not os.path.exists(INDICE):
+        return {"version": 0, "paginas": {}}
+    with open(INDICE, encoding="utf-8") as f:
+        return json.load(f)
+
+def _guardar_pagina(indice, dominio, html, origen):
+    """Escribe la página (gzip reproducible, sin fecha en la cabecera) y su entrada del índice"""
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    with open(ruta_fixture(dominio), "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        gz.write(html)
+    indice["paginas"][dominio] = {
+        "origen": origen,
+        "fecha": datetime.date.today().isoformat(),
+        "bytes": len(html),
+        "sha256": hashlib.sha256(html).hexdigest()
+    }
+
+def _guardar_indice(indice):
+    indice["version"] += 1
+    indice["paginas"] = dict(sorted(indice["paginas"].items()))
+    with open(INDICE, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+def grabar(medios, timeout=20):
+    """Descarga, recorta y guarda la portada de cada medio; devuelve cuántas se han grabado"""
+    from services.http_pool import get_sesion
+
+    indice = cargar_indice()
+    grabadas = 0
+    for medio in medios:
+        try:
+            response = get_sesion().get(medio['url'], timeout=timeout)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"✗ {medio['nombre']}: {e}")
+            continue
+        html = recortar(response.content)
+        _guardar_pagina(indice, normalizar_dominio(medio['url']), html, "grabada")
+        grabadas += 1
+        print(f"✓ {medio['nombre']}: {len(response.content)} bytes, {len(html)} tras recortar")
+    if grabadas:
+        _guardar_indice(indice)
+    return grabadas
+
+def congelar_sinteticas(medios):
+    """Guarda en el corpus una página sintética para cada medio que no tiene ninguna"""
+    indice = cargar_indice()
+    congeladas = 0
+    for medio in medios:
+        dominio = normalizar_dominio(medio['url'])
+        if dominio not in indice["paginas"]:
+            _guardar_pagina(indice, dominio, pagina_sintetica(medio), "sintetica")
+            congeladas += 1
+    if congeladas:
+        _guardar_indice(indice)
+    return congeladas
+
+def pagina_sintetica(medio, n_temas=12, n_noticias=400, semilla=0):
+    """HTML de unos cientos de KB con los temas dentro del contenedor del selector del medio"""
+    aleatorio = random.Random(f"{medio['url']}{semilla}")
+    contenedor = contenedor_de_selector(selector_de(medio)) or ("div", {"tags"}, None)
+    etiqueta, clases, id_ = contenedor
+    etiqueta = etiqueta or "div"
+    atributos = f' class="{" ".join(sorted(clases))}"' if clases else ""
+    atributos += f' id="{id_}"' if id_ else ""
+    hijo = "li" if etiqueta in ("ul", "ol") else "span"
+
+    temas = "".join(
+        f'<{hijo}><a href="/tema/{aleatorio.randrange(10**6)}">{medio["nombre"]} tema {i}</a></{hijo}>'
+        for i in range(n_temas)
+    )
+    noticias = "".join(
+        f'<article><h2><a href="/noticia/{i}">Titular número {i} de {medio["nombre"]}</a></h2>'
+        f'<p>{"Texto de relleno de la entradilla. " * aleatorio.randint(3, 12)}</p></article>'
+        for i in range(n_noticias)
+    )
+    return (
+        f'<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"><title>{medio["nombre"]}</title>'
+        f'<script>{"var x=1;" * 2000}</script></head><body>'
+        f'<header><nav><{etiqueta}{atributos}>{temas}</{etiqueta}></nav></header>'
+        f'<main>{noticias}</main><footer>Pie</footer></body></html>'
+    ).encode("utf-8")
+
+def cargar_paginas(medios):
+    """{dominio: (html, grabada)} con la portada del corpus o, si no hay, una sintética"""
+    indice = cargar_indice()
+    paginas = {}
+    for medio in medios:
+        dominio = normalizar_dominio(medio['url'])
+        ruta = ruta_fixture(dominio)
+        if os.path.exists(ruta):
+            with gzip.open(ruta, "rb") as f:
+                grabada = indice["paginas"].get(dominio, {}).get("origen", "grabada") == "grabada"
+                paginas[dominio] = (f.read(), grabada)
+        else:
+            paginas[dominio] = (pagina_sintetica(medio), False)
+    return paginas
+
+def version_corpus():
+    """Versión del índice y huella del corpus, para anotarlas en los resultados"""
+    indice = cargar_indice()
+    huella = hashlib.sha256("".join(f"{d}:{p['sha256']}" for d, p in sorted(indice["paginas"].items()))
+                            .encode("utf-8")).hexdigest()[:12]
+    return {"version": indice["version"], "paginas": len(indice["paginas"]), "sha256": huella}
+
+if __name__ == "__main__":
+    import argparse
+
+    from services.medios_prensa import MEDIOS_PRENSA
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sinteticas", action="store_true",
+                        help="congelar una página sintética para cada medio sin portada en el corpus")
+    args = parser.parse_args()
+    if args.sinteticas:
+        total = congelar_sinteticas(MEDIOS_PRENSA)
+        print(f"Congeladas {total} portadas sintéticas en {DIRECTORIO}")
+    else:
+        total = grabar(MEDIOS_PRENSA)
+        print(f"Grabadas {total}/{len(MEDIOS_PRENSA)} portadas en {DIRECTORIO}")
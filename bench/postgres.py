@@ -0,0 +1,41 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+def _binario(nombre):
+    ruta = shutil.which(nombre, path=os.environ.get("PG_BIN")) or shutil.which(nombre)
+    if not ruta:
+        raise RuntimeError(f"No se encuentra {nombre}: instala PostgreSQL, define PG_BIN o usa BENCH_DATABASE_URL")
+    return ruta
+
+@contextmanager
+def postgres_temporal():
+    """URL de una base de datos desechable para los benchmarks.
+
+    Con BENCH_DATABASE_URL se usa esa base (debe ser una base de pruebas: se escribe
+    en ella). Si no, se crea un clúster con initdb en un directorio temporal, se
+    arranca con pg_ctl escuchando sólo en un socket local y se borra al terminar.
+    """
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if url:
+        yield url
+        return
+
+    directorio = tempfile.mkdtemp(prefix="bench-pg-")
+    datos = os.path.join(directorio, "datos")
+    pg_ctl = _binario("pg_ctl")
+    try:
+        subprocess.run([_binario("initdb"), "-D", datos, "-U", "postgres", "-A", "trust", "-E", "UTF8"],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([pg_ctl, "-D", datos, "-l", os.path.join(directorio, "postgres.log"), "-w",
+                        "-o", f"-k {directorio} -c listen_addresses=''", "start"],
+                       check=True, stdout=subprocess.DEVNULL)
+        try:
+            yield f"postgresql://postgres@/postgres?host={directorio}"
+        finally:
+            subprocess.run([pg_ctl, "-D", datos, "-m", "fast", "-w", "stop"],
+                           check=False, stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
@@ -0,0 +1,106 @@
+import collections
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from models.medio import normalizar_dominio
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # El escáner deja de leer en cuanto se cierra el contenedor de temas
+            pass
+
+    def do_GET(self):
+        servidor = self.server.portadas
+        # Como proxy HTTP la ruta llega absoluta: GET http://www.medio.es/ HTTP/1.1
+        host = urllib.parse.urlparse(self.path).hostname or self.headers.get("Host", "")
+        pagina = servidor.paginas.get(normalizar_dominio(host))
+        if pagina is None:
+            self._responder(404, b"")
+            return
+        if not servidor.admitir(host):
+            self._responder(429, b"", {"Retry-After": "1"})
+            return
+
+        espera = servidor.latencia + random.uniform(-servidor.jitter, servidor.jitter)
+        if espera > 0:
+            time.sleep(espera)
+        self._responder(200, pagina, {"Content-Type": "text/html; charset=utf-8"})
+
+    def _responder(self, estado, cuerpo, cabeceras=None):
+        servidor = self.server.portadas
+        servidor.contar(estado, len(cuerpo))
+        self.send_response(estado)
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        if not servidor.ancho_banda:
+            self.wfile.write(cuerpo)
+            return
+        bloque = 16384
+        for i in range(0, len(cuerpo), bloque):
+            trozo = cuerpo[i:i + bloque]
+            self.wfile.write(trozo)
+            time.sleep(len(trozo) / servidor.ancho_banda)
+
+    def log_message(self, *args):
+        pass
+
+class ServidorPortadas:
+    """Proxy HTTP local que sirve una portada por dominio.
+
+    `latencia` (± `jitter`) se espera antes de enviar las cabeceras, `ancho_banda`
+    (bytes/s) limita la velocidad del cuerpo y `limite_por_segundo` responde 429
+    a partir de ese número de peticiones por host y segundo.
+    """
+
+    def __init__(self, paginas, latencia=0.0, jitter=0.0, ancho_banda=None, limite_por_segundo=None):
+        self.paginas = paginas
+        self.latencia = latencia
+        self.jitter = jitter
+        self.ancho_banda = ancho_banda
+        self.limite_por_segundo = limite_por_segundo
+        self.estadisticas = {"peticiones": 0, "bytes": 0, "estados": {}}
+        self._accesos = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    def admitir(self, host):
+        if not self.limite_por_segundo:
+            return True
+        ahora = time.monotonic()
+        with self._lock:
+            accesos = self._accesos[host]
+            while accesos and ahora - accesos[0] > 1:
+                accesos.popleft()
+            if len(accesos) >= self.limite_por_segundo:
+                return False
+            accesos.append(ahora)
+            return True
+
+    def contar(self, estado, enviados):
+        with self._lock:
+            self.estadisticas["peticiones"] += 1
+            self.estadisticas["bytes"] += enviados
+            self.estadisticas["estados"][str(estado)] = self.estadisticas["estados"].get(str(estado), 0) + 1
+
+    def iniciar(self):
+        """Arranca el servidor en un hilo y devuelve su URL para usarla como proxy"""
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Manejador)
+        self._servidor.daemon_threads = True
+        self._servidor.portadas = self
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._servidor.server_port}"
+
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
@@ -1,5 +1,19 @@
+import logging
 import os
 
+def _dias_por_tipo(valor):
+    """'propio:30,competencia:7' → {'propio': 30, 'competencia': 7}"""
+    dias = {}
+    for parte in (valor or "").split(","):
+        if ":" in parte:
+            tipo, numero = parte.split(":", 1)
+            dias[tipo.strip()] = int(numero)
+    return dias
+
+def _lista(valor):
+    """'utm_*, fbclid' → ['utm_*', 'fbclid']"""
+    return [parte.strip().lower() for parte in (valor or "").split(",") if parte.strip()]
+
 class Config:
     # Configuración de la base de datos
     DATABASE_DIR = '/var/data' if os.path.exists('/var/data') else '.'
@@ -7,4 +21,81 @@ class Config:
     
     # Otras configuraciones
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-12345'
-    DEBUG = os.environ.get('FLASK_ENV') != 'production'
\ No newline at end of file
+    DEBUG = os.environ.get('FLASK_ENV') != 'production'
+
+    # Escaneo
+    SCAN_CONCURRENCIA = int(os.environ.get('SCAN_CONCURRENCIA', 5))
+    SCAN_INTERVALO_HOST = float(os.environ.get('SCAN_INTERVALO_HOST', 1.5))
+    HTTP_POOL_HOSTS = int(os.environ.get('HTTP_POOL_HOSTS', 100))
+    SCAN_MAX_BYTES = int(os.environ.get('SCAN_MAX_BYTES', 2 * 1024 * 1024))
+    # Un medio escaneado hace menos de estos minutos no se vuelve a descargar en otro escaneo
+    SCAN_FRESCURA_MINUTOS = int(os.environ.get('SCAN_FRESCURA_MINUTOS', 10))
+
+    # Parámetros de seguimiento que se quitan de la URL de cada tema ('prefijo*' admite comodín)
+    URL_PARAMETROS_SEGUIMIENTO = _lista(os.environ.get(
+        'URL_PARAMETROS_SEGUIMIENTO',
+        'utm_*,fbclid,gclid,dclid,gbraid,wbraid,msclkid,yclid,igshid,mc_cid,mc_eid,_ga,_gl'
+    ))
+
+    # Pool de conexiones PostgreSQL (por proceso / worker de gunicorn)
+    DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+    DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
+    # Servidor ASGI (asgi.py): pool asyncpg propio por worker e hilos para las rutas Flask montadas
+    ASYNC_DB_POOL_MIN = int(os.environ.get('ASYNC_DB_POOL_MIN', 1))
+    ASYNC_DB_POOL_MAX = int(os.environ.get('ASYNC_DB_POOL_MAX', 10))
+    ASGI_HILOS_WSGI = int(os.environ.get('ASGI_HILOS_WSGI', 32))
+
+    # Caché de lectura para los endpoints de la extensión
+    CACHE_TTL = float(os.environ.get('CACHE_TTL', 300))
+    CACHE_MAX_ENTRADAS = int(os.environ.get('CACHE_MAX_ENTRADAS', 1024))
+    CACHE_VERSION_CHECK = float(os.environ.get('CACHE_VERSION_CHECK', 5))
+
+    # Worker de escaneo (worker.py)
+    WORKER_INTERVALO_SONDEO = float(os.environ.get('WORKER_INTERVALO_SONDEO', 5))
+    WORKER_ESPERA_LOCK = float(os.environ.get('WORKER_ESPERA_LOCK', 30))
+
+    # Escaneos seguidos sin resultados antes de volver a sondear selectores
+    SELECTOR_FALLOS_MAX = int(os.environ.get('SELECTOR_FALLOS_MAX', 3))
+
+    # Planificación adaptativa: intervalo por medio según los cambios de sus temas
+    SCAN_INTERVALO_MIN_MINUTOS = int(os.environ.get('SCAN_INTERVALO_MIN_MINUTOS', 15))
+    SCAN_INTERVALO_MAX_MINUTOS = int(os.environ.get('SCAN_INTERVALO_MAX_MINUTOS', 360))
+    SCAN_INTERVALO_DEFECTO_MINUTOS = int(os.environ.get('SCAN_INTERVALO_DEFECTO_MINUTOS', 60))
+    SCAN_VENTANA_CAMBIOS_HORAS = int(os.environ.get('SCAN_VENTANA_CAMBIOS_HORAS', 72))
+    SCAN_CAMBIOS_POR_ESCANEO = float(os.environ.get('SCAN_CAMBIOS_POR_ESCANEO', 1))
+
+    # Importación masiva de medios
+    IMPORTACION_MAX_FILAS = int(os.environ.get('IMPORTACION_MAX_FILAS', 10000))
+
+    # Retención de temas: días por tipo de medio y borrado por lotes
+    RETENCION_DIAS = int(os.environ.get('RETENCION_DIAS', 7))
+    RETENCION_DIAS_POR_TIPO = _dias_por_tipo(os.environ.get('RETENCION_DIAS_POR_TIPO'))
+    RETENCION_LOTE = int(os.environ.get('RETENCION_LOTE', 5000))
+    RETENCION_PAUSA = float(os.environ.get('RETENCION_PAUSA', 0.5))
+    # Escaneos (scan_runs, scan_runs_medios y observaciones) que se conservan
+    RETENCION_ESCANEOS_DIAS = int(os.environ.get('RETENCION_ESCANEOS_DIAS', 30))
+
+    # Canal de eventos en vivo (/api/eventos)
+    EVENTOS_LATIDO = float(os.environ.get('EVENTOS_LATIDO', 15))
+    EVENTOS_DURACION_MAX = float(os.environ.get('EVENTOS_DURACION_MAX', 1800))
+    EVENTOS_MAX_SUSCRIPTORES = int(os.environ.get('EVENTOS_MAX_SUSCRIPTORES', 100))
+    # Con workers gthread cada flujo ocupa un hilo: por defecto, un cuarto de GUNICORN_THREADS
+    EVENTOS_MAX_SUSCRIPTORES_WSGI = int(os.environ.get(
+        'EVENTOS_MAX_SUSCRIPTORES_WSGI', max(1, int(os.environ.get('GUNICORN_THREADS', 32)) // 4)
+    ))
+
+    # Fichero de log opcional del worker de escaneo (además de la salida estándar)
+    SCANNER_LOG = os.environ.get('SCANNER_LOG')
+
+def configurar_logging(fichero=None):
+    """Logging de los procesos: se llama desde su punto de entrada, nunca al importar módulos"""
+    handlers = [logging.StreamHandler()]
+    if fichero:
+        handlers.append(logging.FileHandler(fichero))
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=handlers
+    )
@@ -1,11 +1,23 @@
-from flask import Blueprint, request, jsonify
-from models.medio import get_all_medios, add_medio
-from models.tema import get_temas_por_dominio
-from services.scanner import escanear_medios_por_lotes as escanear_todos_los_medios, agregar_medios_prensa
-from threading import Thread
-from models.tema import get_db_connection
-import psycopg2
-import psycopg2.extras
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import itertools
+import math
+import time
+from flask import Blueprint, request, jsonify, make_response, Response
+from config import Config
+from models.medio import (get_all_medios, add_medio, importar_medios, resumir_importacion, normalizar_dominio,
+                          get_salud_selectores, get_planificacion, get_ids_medios_dominio)
+from models.tema import get_datos_temas_por_dominio, formatear_temas, formatear_temas_compacto, get_ids_medios_seleccion
+from models.escaneo import encolar_escaneo, get_escaneo, get_ultimos_escaneos
+from models.historial import get_historial_tema, get_temas_no_cubiertos
+from models.cobertura import get_cobertura_por_dominio
+from services.eventos import suscribir, flujo_sse, DemasiadosSuscriptores
+from services.medios_prensa import agregar_medios_prensa
+from models.db import get_metricas_pool
+from models.cache import get_metricas_cache
 
 
 api_bp = Blueprint('api', __name__)
@@ -30,21 +42,116 @@ def obtener_temas_flexibles():
     tipo_medio = request.args.get('tipo', 'todos')
 
     if dominio:
-        temas = get_temas_por_dominio(dominio)
-        return jsonify({"temas": temas})
+        return _respuesta_temas_dominio(dominio, request.args.get('formato') == 'compacto')
     else:
         temas = get_temas(tipo_medio)
         return jsonify(temas)
 
+# Bajo este tamaño no compensa comprimir
+GZIP_MIN_BYTES = 512
+
+def etag_temas_dominio(dominio, version, compacto, usar_gzip):
+    """ETag de /api/temas?dominio=; también lo usa el servidor ASGI (asgi.py)"""
+    # El formato completo incluye duracion_horas (resolución de 0,1 h), así que su ETag
+    # también cambia cada 6 minutos; el compacto sólo cambia con un nuevo escaneo.
+    partes = [normalizar_dominio(dominio), version, 'c' if compacto else str(int(time.time() // 360))]
+    etag = hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()[:20]
+    return etag + "-gz" if usar_gzip else etag
+
+def _respuesta_temas_dominio(dominio, compacto):
+    """Respuesta de /api/temas?dominio= con ETag fuerte, 304 y gzip opcional"""
+    version, filas = get_datos_temas_por_dominio(dominio)
+    usar_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = etag_temas_dominio(dominio, version, compacto, usar_gzip)
+
+    if request.if_none_match.contains(etag):
+        respuesta = make_response('', 304)
+    else:
+        if compacto:
+            respuesta = jsonify({"temas": formatear_temas_compacto(filas)})
+        else:
+            respuesta = jsonify({"temas": formatear_temas(filas)})
+        if usar_gzip and respuesta.content_length and respuesta.content_length >= GZIP_MIN_BYTES:
+            respuesta.set_data(gzip.compress(respuesta.get_data(), compresslevel=6))
+            respuesta.headers['Content-Encoding'] = 'gzip'
+
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
+
+def _respuesta_encolado(tipo, mensaje):
+    escaneo_id, nuevo = encolar_escaneo(tipo)
+    if not nuevo:
+        mensaje = 'Ya hay un escaneo en curso o pendiente'
+    return jsonify({'mensaje': mensaje, 'escaneo_id': escaneo_id}), 202
+
+@api_bp.route('/temas/<int:tema_id>/historial', methods=['GET'])
+def historial_tema(tema_id):
+    """Intervalos en los que el tema ha estado en portada"""
+    return jsonify(get_historial_tema(tema_id))
+
+# Ventana máxima de /temas-no-cubiertos: un año
+HORAS_NO_CUBIERTOS_MAX = 24 * 365
+
+@api_bp.route('/medios/<int:medio_id>/temas-no-cubiertos', methods=['GET'])
+def temas_no_cubiertos(medio_id):
+    """Temas que la competencia tuvo en portada en las últimas `horas` y el medio no"""
+    try:
+        horas = float(request.args.get('horas', 24))
+    except ValueError:
+        return jsonify({'error': 'horas debe ser numérico'}), 400
+    if not math.isfinite(horas) or not 0 < horas <= HORAS_NO_CUBIERTOS_MAX:
+        return jsonify({'error': f'horas debe estar entre 0 y {HORAS_NO_CUBIERTOS_MAX}'}), 400
+    hasta = datetime.datetime.now()
+    desde = hasta - datetime.timedelta(hours=horas)
+    return jsonify(get_temas_no_cubiertos(medio_id, desde, hasta))
+
+def medios_eventos(dominio, medio_id, tipo):
+    """Ids de medios de una suscripción a /api/eventos (None = todos); también la usa asgi.py"""
+    tipo = '' if tipo == 'todos' else tipo
+    if dominio:
+        return get_ids_medios_dominio(dominio)
+    if medio_id or tipo:
+        return get_ids_medios_seleccion(medio_id, tipo)
+    return None
+
+@api_bp.route('/eventos', methods=['GET'])
+def eventos_temas():
+    """Cambios de temas en vivo como Server-Sent Events.
+
+    Con `dominio` (extensión) se reciben los de ese dominio; con `medio_id`/`tipo`
+    los mismos medios que en /visualizar/. `formato=compacto` usa claves cortas.
+    """
+    medios = medios_eventos(request.args.get('dominio'), request.args.get('medio_id', type=int),
+                            request.args.get('tipo', ''))
+    # Cada flujo ocupa un hilo del worker: el límite deja hilos libres para el resto de
+    # rutas. Con muchas pestañas abiertas conviene servir con WEB_ASGI=1 (asgi.py).
+    try:
+        cola = suscribir(medios, maximo=Config.EVENTOS_MAX_SUSCRIPTORES_WSGI)
+    except DemasiadosSuscriptores as e:
+        return jsonify({'error': str(e)}), 503
+    return Response(
+        flujo_sse(cola, request.args.get('formato') == 'compacto'),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @api_bp.route('/iniciar-escaneo', methods=['GET', 'POST'])
 def iniciar_escaneo_manual():
-    """Inicia escaneo manual en segundo plano"""
-    def run_background():
-        from services.scanner import escanear_medios_por_lotes
-        escanear_medios_por_lotes(lote_size=5)
+    """Encola un escaneo manual para el worker de escaneo"""
+    return _respuesta_encolado('medios', 'Escaneo manual encolado')
+
+@api_bp.route('/escaneos', methods=['GET'])
+def listar_escaneos():
+    return jsonify(get_ultimos_escaneos())
 
-    Thread(target=run_background).start()
-    return jsonify({'mensaje': 'Escaneo manual iniciado en segundo plano'}), 202
+@api_bp.route('/escaneos/<int:escaneo_id>', methods=['GET'])
+def estado_escaneo(escaneo_id):
+    escaneo = get_escaneo(escaneo_id)
+    if not escaneo:
+        return jsonify({'error': 'Escaneo no encontrado'}), 404
+    return jsonify(escaneo)
 
 @api_bp.route('/agregar-medios-prensa', methods=['GET', 'POST'])
 def agregar_medios_prensa_endpoint():
@@ -59,24 +166,31 @@ def agregar_medios_iniciales():
     if not data or 'medios' not in data:
         return jsonify({'error': 'Datos incompletos'}), 400
 
-    medios = data['medios']
-    medios_agregados = 0
-    medios_existentes = 0
-
-    for medio in medios:
-        if 'nombre' not in medio or 'url' not in medio or 'tipo' not in medio:
-            continue
-
-        resultado, status_code = add_medio(medio['nombre'], medio['url'], medio['tipo'])
-        if status_code == 201:
-            medios_agregados += 1
-        else:
-            medios_existentes += 1
+    resumen = resumir_importacion(importar_medios(data['medios']))
 
     return jsonify({
-        'mensaje': f'Proceso completado. Medios agregados: {medios_agregados}, ya existentes: {medios_existentes}'
+        'mensaje': f'Proceso completado. Medios agregados: {resumen["insertados"]}, ya existentes: {resumen["actualizados"]}'
     }), 200
 
+@api_bp.route('/medios/importar', methods=['POST'])
+def importar_medios_endpoint():
+    """Importación masiva de medios desde JSON ({"medios": [...]}) o CSV (nombre,url,tipo,selector)"""
+    if request.mimetype == 'text/csv':
+        lector = csv.DictReader(io.TextIOWrapper(request.stream, encoding='utf-8-sig'))
+        medios = itertools.islice(lector, Config.IMPORTACION_MAX_FILAS + 1)
+    else:
+        data = request.get_json(silent=True)
+        medios = data.get('medios') if isinstance(data, dict) else data
+        if not isinstance(medios, list):
+            return jsonify({'error': 'Se esperaba una lista de medios'}), 400
+
+    medios = list(medios)
+    if len(medios) > Config.IMPORTACION_MAX_FILAS:
+        return jsonify({'error': f'Máximo {Config.IMPORTACION_MAX_FILAS} medios por importación'}), 413
+
+    resultados = importar_medios(medios)
+    return jsonify({**resumir_importacion(resultados), 'filas': resultados}), 200
+
 from models.competidor import add_competidor
 
 @api_bp.route('/competidores', methods=['POST'])
@@ -88,17 +202,12 @@ def agregar_competidor():
     add_competidor(data['medio_competidor_id'], data['medio_padre_id'])
     return jsonify({'mensaje': 'Competidor vinculado correctamente'})
 
-from services.scanner import escanear_competidores_por_lotes
-
 @api_bp.route('/iniciar-escaneo-competidores', methods=['POST'])
 def iniciar_escaneo_competidores():
-    def run_bg():
-        escanear_competidores_por_lotes()
-    Thread(target=run_bg).start()
-    return jsonify({"mensaje": "Escaneo de competidores en segundo plano"})
+    return _respuesta_encolado('competidores', 'Escaneo de competidores encolado')
 
 from flask import request, jsonify
-from models.competidor import get_competidores_relacionados
+from models.competidor import get_competidores_por_dominio
 
 @api_bp.route('/competidores-relacionados')
 def competidores_relacionados():
@@ -106,26 +215,33 @@ def competidores_relacionados():
     if not dominio:
         return jsonify({"error": "Dominio requerido"}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    # Buscar medio propio por dominio
-    cursor.execute("SELECT id FROM medios WHERE url ILIKE %s AND tipo = 'propio'", [f'%{dominio}%'])
-    medio = cursor.fetchone()
-
-    if not medio:
-        conn.close()
-        return jsonify([])
-
-    # Obtener competidores asociados a ese medio propio
-    cursor.execute("""
-        SELECT m.id, m.nombre, m.url 
-        FROM competidores c 
-        JOIN medios m ON m.id = c.medio_competidor_id
-        WHERE c.medio_padre_id = %s
-    """, [medio['id']])
-    competidores = cursor.fetchall()
-    conn.close()
-    return jsonify(competidores)
+    return jsonify(get_competidores_por_dominio(dominio))
+
+@api_bp.route('/cobertura')
+def cobertura_competencia():
+    """Temas que la competencia tiene y el medio propio no, y los exclusivos del medio"""
+    dominio = request.args.get("dominio")
+    if not dominio:
+        return jsonify({"error": "Dominio requerido"}), 400
+
+    cobertura = get_cobertura_por_dominio(dominio)
+    if cobertura is None:
+        return jsonify({"error": "Medio propio no encontrado"}), 404
+    return jsonify(cobertura)
+
+@api_bp.route('/planificacion')
+def planificacion_escaneos():
+    """Intervalo de escaneo asignado a cada medio y cuándo le toca el próximo"""
+    return jsonify(get_planificacion())
+
+@api_bp.route('/selectores')
+def salud_selectores():
+    """Selector en uso y tasa de aciertos por medio; los rotos primero"""
+    return jsonify(get_salud_selectores(Config.SELECTOR_FALLOS_MAX))
+
+@api_bp.route('/metricas-db')
+def metricas_db():
+    """Estado del pool de conexiones y de la caché de este worker"""
+    return jsonify({"pool": get_metricas_pool(), "cache": get_metricas_cache()})
 
 
@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, Response
 from models.tema import get_temas_visualizacion
 from models.medio import get_all_medios
+from models.historial import get_ultimos_scan_runs, get_ultimas_mediciones_medios
+from models.db import get_metricas_pool
+from models.cache import get_metricas_cache
+from services import metricas
 import datetime
 
 web_bp = Blueprint('web', __name__)
@@ -13,18 +17,66 @@ def index():
 def health_check():
     return "OK"
 
+def _series_metricas():
+    series = metricas.get_contadores()
+    series += [(f"db_pool_{clave}", "gauge", {}, valor) for clave, valor in get_metricas_pool().items()]
+    series += [(f"cache_{clave}", "gauge", {}, valor) for clave, valor in get_metricas_cache().items()]
+
+    # El escáner corre en worker.py: sus números se leen de scan_runs
+    for run in get_ultimos_scan_runs():
+        tipo = {"tipo": run['tipo']}
+        estadisticas = run['estadisticas']
+        series += [
+            ("scanner_ultimo_escaneo_timestamp_seconds", "gauge", tipo, run['fin'].timestamp()),
+            ("scanner_ultimo_escaneo_duracion_segundos", "gauge", tipo, estadisticas.get("duracion_segundos")),
+            ("scanner_ultimo_escaneo_medios", "gauge", tipo, estadisticas.get("medios")),
+            ("scanner_ultimo_escaneo_medios_sin_temas", "gauge", tipo, estadisticas.get("medios_sin_temas")),
+            ("scanner_ultimo_escaneo_bytes", "gauge", tipo, estadisticas.get("bytes")),
+        ]
+        series += [("scanner_ultimo_escaneo_etapa_segundos", "gauge", {**tipo, "etapa": etapa}, segundos)
+                   for etapa, segundos in estadisticas.get("etapas", {}).items()]
+        series += [("scanner_ultimo_escaneo_http_respuestas", "gauge", {**tipo, "estado": estado}, n)
+                   for estado, n in estadisticas.get("http", {}).items()]
+
+    for m in get_ultimas_mediciones_medios():
+        medio = {"medio": m['nombre']}
+        series.append(("scanner_medio_segundos", "gauge", medio, m['segundos']))
+        series.append(("scanner_medio_temas", "gauge", medio, m['temas']))
+        series.append(("scanner_medio_estado_http", "gauge", medio, m['estado_http']))
+        series += [("scanner_medio_etapa_segundos", "gauge", {**medio, "etapa": etapa}, m[etapa])
+                   for etapa in metricas.ETAPAS]
+    return series
+
+@web_bp.route('/metrics')
+def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(metricas.render_prometheus(_series_metricas()),
+                    content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _leer_cursor(valor):
+    """Cursor de paginación 'ultima_vez_id' → (datetime, id), o None si no es válido"""
+    if not valor:
+        return None
+    try:
+        fecha, tema_id = valor.rsplit("_", 1)
+        return datetime.datetime.fromisoformat(fecha), int(tema_id)
+    except ValueError:
+        return None
+
 @web_bp.route("/visualizar/")
 def visualizar_temas():
     medio_id = request.args.get("medio_id", type=int)
     tipo = request.args.get("tipo", default="", type=str)
     page = request.args.get("page", default=1, type=int)
     visible = request.args.get("visible")  # 👈 Añadido
+    despues = _leer_cursor(request.args.get("despues"))
 
     temas, medios, stats = get_temas_visualizacion(
         medio_id=medio_id,
         tipo_medio=tipo if tipo != "todos" else "",
         visible=visible,  # 👈 Añadido
-        page=page
+        page=page,
+        despues=despues
     )
 
     return render_template(
@@ -36,6 +88,8 @@ def visualizar_temas():
         page=page,
         medio_seleccionado=medio_id,
         tipo_seleccionado=tipo,
-        visible=visible  # 👈 Para que lo conserve en la vista
+        visible=visible,  # 👈 Para que lo conserve en la vista
+        siguiente=stats["temas"]["siguiente"],
+        timestamp=datetime.datetime.now().strftime("%d/%m/%Y %H:%M")
     )
 
@@ -0,0 +1,40 @@
+import os
+
+# El bind sale de $PORT y el número de workers de $WEB_CONCURRENCY (valores por defecto de gunicorn)
+# Con WEB_ASGI=1 se sirve asgi:app con workers de uvicorn: las lecturas de la extensión
+# van por asyncpg y el resto de rutas por la app Flask montada (ver asgi.py)
+if os.environ.get("WEB_ASGI") == "1":
+    wsgi_app = "asgi:app"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "app:app"
+    worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+timeout = 120
+
+# Importar app no abre conexiones ni arranca hilos, así que se puede cargar en el máster
+# y compartir la memoria del código con los workers
+preload_app = True
+
+def on_starting(server):
+    from config import configurar_logging
+    from models.db import cerrar_pool
+    from models.esquema import asegurar_esquema
+
+    configurar_logging()
+    try:
+        asegurar_esquema()
+    except Exception as e:
+        server.log.warning(f"No se pudo verificar el esquema de la base de datos: {e}")
+    finally:
+        cerrar_pool()
+
+def post_fork(server, worker):
+    # Cada worker abre su propio pool al arrancar para que la primera petición no pague la conexión
+    from models.db import conexion
+
+    try:
+        with conexion():
+            pass
+    except Exception as e:
+        server.log.warning(f"Worker {worker.pid} sin conexión a la base de datos: {e}")
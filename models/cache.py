@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from models.db import conexion
+
+# Caché LRU con TTL por proceso, sincronizada con la base de datos para que todos los
+# workers vean las invalidaciones. La versión global (version_cache) cubre los cambios de
+# estructura (medios, competidores) y vacía la caché entera; medios.version_temas cubre
+# cada escaneo y sólo expulsa las entradas de los dominios que dependen de ese medio.
+_entradas = OrderedDict()
+_lock = threading.Lock()
+_estado = {"version": None, "versiones_medios": {}, "comprobada": 0.0}
+_metricas = {"aciertos": 0, "fallos": 0, "expulsiones": 0, "invalidaciones": 0, "invalidaciones_dominio": 0}
+
+# Entradas que dependen de los temas de los medios de su dominio: ("temas", dominio) y
+# ("cobertura", dominio), que además depende de los competidores del medio
+_POR_DOMINIO = ("temas", "cobertura")
+
+_CONSULTA_VERSION = "SELECT version FROM version_cache WHERE id = 1"
+_CONSULTA_VERSIONES_MEDIOS = "SELECT id, version_temas FROM medios"
+# Dominio de cada medio cambiado y de los medios propios de los que es competidor
+_CONSULTA_DOMINIOS = """
+    SELECT dominio FROM medios WHERE id = ANY({ids})
+    UNION
+    SELECT p.dominio FROM competidores c
+    JOIN medios p ON p.id = c.medio_padre_id
+    WHERE c.medio_competidor_id = ANY({ids})
+"""
+
+def _medios_cambiados(version, versiones_medios):
+    """Ids de los medios con version_temas distinta de la última vista, o None si
+    cambió la versión global (o es la primera sincronización) y hay que vaciar todo"""
+    if version != _estado["version"]:
+        return None
+    anteriores = _estado["versiones_medios"]
+    return [medio_id for medio_id, v in versiones_medios.items() if anteriores.get(medio_id) != v]
+
+def _aplicar_version(version, versiones_medios, dominios, ahora):
+    with _lock:
+        _estado["comprobada"] = ahora
+        if version != _estado["version"]:
+            if _estado["version"] is not None:
+                _metricas["invalidaciones"] += 1
+            _entradas.clear()
+            _estado["version"] = version
+        elif dominios:
+            for clave in [c for c in _entradas if c[0] in _POR_DOMINIO and c[1] in dominios]:
+                del _entradas[clave]
+            _metricas["invalidaciones_dominio"] += len(dominios)
+        _estado["versiones_medios"] = versiones_medios
+
+def _sincronizar_version():
+    ahora = time.monotonic()
+    if ahora - _estado["comprobada"] < Config.CACHE_VERSION_CHECK:
+        return
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_CONSULTA_VERSION)
+        fila = cursor.fetchone()
+        version = fila[0] if fila else 0
+        cursor.execute(_CONSULTA_VERSIONES_MEDIOS)
+        versiones_medios = dict(cursor.fetchall())
+        cambiados = _medios_cambiados(version, versiones_medios)
+        dominios = set()
+        if cambiados:
+            cursor.execute(_CONSULTA_DOMINIOS.format(ids="%(ids)s"), {"ids": cambiados})
+            dominios = {dominio for (dominio,) in cursor.fetchall()}
+    _aplicar_version(version, versiones_medios, dominios, ahora)
+
+def _buscar(clave, ahora):
+    with _lock:
+        entrada = _entradas.get(clave)
+        if entrada and entrada[0] > ahora:
+            _entradas.move_to_end(clave)
+            _metricas["aciertos"] += 1
+            return True, entrada[1]
+        _metricas["fallos"] += 1
+    return False, None
+
+def _guardar(clave, valor, ahora, ttl):
+    with _lock:
+        _entradas[clave] = (ahora + (ttl or Config.CACHE_TTL), valor)
+        _entradas.move_to_end(clave)
+        while len(_entradas) > Config.CACHE_MAX_ENTRADAS:
+            _entradas.popitem(last=False)
+            _metricas["expulsiones"] += 1
+
+def obtener(clave, cargar, ttl=None):
+    """Devuelve el valor cacheado para `clave` o lo calcula con `cargar()`"""
+    _sincronizar_version()
+    ahora = time.monotonic()
+    encontrado, valor = _buscar(clave, ahora)
+    if encontrado:
+        return valor
+    valor = cargar()
+    _guardar(clave, valor, ahora, ttl)
+    return valor
+
+async def obtener_async(clave, cargar, ttl=None):
+    """Como obtener() para el servidor ASGI: `cargar` es una corrutina y la versión global
+    se lee con el pool asíncrono. Comparte entradas con obtener(), así que las claves
+    deben guardar los mismos valores en ambos caminos."""
+    from models import db_async
+
+    ahora = time.monotonic()
+    if ahora - _estado["comprobada"] >= Config.CACHE_VERSION_CHECK:
+        async with db_async.conexion() as conn:
+            version = await conn.fetchval(_CONSULTA_VERSION) or 0
+            versiones_medios = dict(await conn.fetch(_CONSULTA_VERSIONES_MEDIOS))
+            cambiados = _medios_cambiados(version, versiones_medios)
+            dominios = set()
+            if cambiados:
+                filas = await conn.fetch(_CONSULTA_DOMINIOS.format(ids="$1::int[]"), cambiados)
+                dominios = {fila["dominio"] for fila in filas}
+        _aplicar_version(version, versiones_medios, dominios, ahora)
+    encontrado, valor = _buscar(clave, ahora)
+    if encontrado:
+        return valor
+    valor = await cargar()
+    _guardar(clave, valor, ahora, ttl)
+    return valor
+
+def invalidar_medio(medio_id=None):
+    """Marca como cambiados los temas de un medio, o todos los datos si no se pasa,
+    en todos los workers. Este proceso se sincroniza en la siguiente lectura."""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        if medio_id is not None:
+            cursor.execute(
+                "UPDATE medios SET version_temas = version_temas + 1 WHERE id = %s",
+                (medio_id,)
+            )
+        else:
+            cursor.execute("UPDATE version_cache SET version = version + 1 WHERE id = 1")
+        conn.commit()
+    with _lock:
+        _estado["comprobada"] = 0.0
+
+def get_metricas_cache():
+    with _lock:
+        metricas = dict(_metricas)
+        metricas["entradas"] = len(_entradas)
+    return metricas
@@ -0,0 +1,47 @@
+import re
+import unicodedata
+import urllib.parse
+
+from config import Config
+
+def normalizar_nombre(nombre):
+    """Clave de comparación de un tema: sin tildes, mayúsculas ni espacios repetidos.
+    'Crisis  en Valéncia' → 'crisis en valencia'"""
+    if not nombre:
+        return ""
+    descompuesto = unicodedata.normalize("NFKD", nombre)
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", sin_tildes).strip().casefold()
+
+def limpiar_nombre(nombre):
+    """Nombre que se muestra: el texto del enlace en NFC y sin espacios repetidos"""
+    if not nombre:
+        return ""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", nombre)).strip()
+
+def _es_seguimiento(parametro, parametros):
+    nombre = urllib.parse.unquote_plus(parametro.split("=", 1)[0]).lower()
+    return any(nombre.startswith(p[:-1]) if p.endswith("*") else nombre == p for p in parametros)
+
+def canonizar_url(url, parametros=None):
+    """URL canónica de un tema: https, host en minúsculas sin puerto por defecto, sin
+    barra final, sin fragmento y sin parámetros de seguimiento (URL_PARAMETROS_SEGUIMIENTO).
+    Con un puerto propio se conserva el esquema: el host puede no servir https.
+    'HTTP://WWW.Epe.es:80/es/tema/?utm_source=x&id=3#top' → 'https://www.epe.es/es/tema?id=3'"""
+    if not url:
+        return url
+    partes = urllib.parse.urlsplit(url.strip())
+    if partes.scheme.lower() not in ("http", "https") or not partes.hostname:
+        return url.strip()
+
+    esquema, host = "https", partes.hostname
+    if partes.port and partes.port not in (80, 443):
+        esquema, host = partes.scheme.lower(), f"{host}:{partes.port}"
+    if parametros is None:
+        parametros = Config.URL_PARAMETROS_SEGUIMIENTO
+    consulta = "&".join(p for p in partes.query.split("&") if p and not _es_seguimiento(p, parametros))
+    return urllib.parse.urlunsplit((esquema, host, partes.path.rstrip("/"), consulta, ""))
+
+def canonizar_tema(nombre, url):
+    """(nombre, nombre_clave, url) con los que se guarda un tema; la identidad es (medio_id, nombre_clave, url)"""
+    return limpiar_nombre(nombre), normalizar_nombre(nombre), canonizar_url(url)
@@ -0,0 +1,76 @@
+import psycopg2
+import psycopg2.extras
+from models import cache
+from models.canonico import normalizar_nombre
+from models.db import conexion
+from models.medio import normalizar_dominio
+
+def actualizar_cobertura_medio(cursor, medio_id, temas):
+    """Sustituye en cobertura_temas las claves visibles de un medio.
+
+    Se llama con el cursor de la transacción que guarda los temas, así el resumen
+    nunca queda desfasado respecto a la visibilidad de temas.
+    """
+    claves = {}
+    for nombre, url in temas:
+        clave = normalizar_nombre(nombre)
+        if clave and clave not in claves:
+            claves[clave] = (medio_id, clave, nombre, url)
+    cursor.execute("DELETE FROM cobertura_temas WHERE medio_id = %s", (medio_id,))
+    if claves:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO cobertura_temas (medio_id, clave, nombre, url) VALUES %s
+        """, list(claves.values()), page_size=len(claves))
+
+def _cargar_cobertura(dominio_limpio):
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(
+            "SELECT id, nombre FROM medios WHERE dominio = %s AND tipo = 'propio' ORDER BY id LIMIT 1",
+            (dominio_limpio,)
+        )
+        medio = cursor.fetchone()
+        if not medio:
+            return None
+
+        # Temas de la competencia que el medio no tiene en portada
+        cursor.execute("""
+            SELECT ct.clave, MIN(ct.nombre) AS nombre,
+                   json_agg(json_build_object('medio', m.nombre, 'url', ct.url) ORDER BY m.nombre) AS medios
+            FROM competidores c
+            JOIN cobertura_temas ct ON ct.medio_id = c.medio_competidor_id
+            JOIN medios m ON m.id = ct.medio_id
+            WHERE c.medio_padre_id = %(medio_id)s
+              AND NOT EXISTS (
+                  SELECT 1 FROM cobertura_temas p
+                  WHERE p.medio_id = %(medio_id)s AND p.clave = ct.clave
+              )
+            GROUP BY ct.clave
+            ORDER BY COUNT(*) DESC, ct.clave
+        """, {"medio_id": medio['id']})
+        faltan = cursor.fetchall()
+
+        # Temas del medio que no tiene ningún competidor
+        cursor.execute("""
+            SELECT p.clave, p.nombre, p.url
+            FROM cobertura_temas p
+            WHERE p.medio_id = %(medio_id)s
+              AND NOT EXISTS (
+                  SELECT 1 FROM competidores c
+                  JOIN cobertura_temas ct ON ct.medio_id = c.medio_competidor_id
+                  WHERE c.medio_padre_id = %(medio_id)s AND ct.clave = p.clave
+              )
+            ORDER BY p.clave
+        """, {"medio_id": medio['id']})
+        exclusivos = cursor.fetchall()
+
+    return {
+        "medio": {"id": medio['id'], "nombre": medio['nombre']},
+        "faltan": faltan,
+        "exclusivos": exclusivos
+    }
+
+def get_cobertura_por_dominio(dominio):
+    """Temas que la competencia de un medio propio tiene y él no (faltan) y viceversa (exclusivos)"""
+    dominio_limpio = normalizar_dominio(dominio)
+    return cache.obtener(("cobertura", dominio_limpio), lambda: _cargar_cobertura(dominio_limpio))
@@ -1,59 +1,58 @@
 import psycopg2
 import psycopg2.extras
-from config import Config
-
-def get_db_connection():
-    return psycopg2.connect(Config.DATABASE)
+from models import cache, db_async
+from models.db import conexion
 
 def add_competidor(medio_competidor_id, medio_padre_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO competidores (medio_competidor_id, medio_padre_id)
-        VALUES (%s, %s)
-        ON CONFLICT DO NOTHING
-    """, (medio_competidor_id, medio_padre_id))
-    conn.commit()
-    conn.close()
-
-def get_competidores_por_medio_padre(medio_padre_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("""
-        SELECT m.* FROM competidores c
-        JOIN medios m ON c.medio_competidor_id = m.id
-        WHERE c.medio_padre_id = %s
-    """, (medio_padre_id,))
-    resultados = cursor.fetchall()
-    conn.close()
-    return resultados
-
-def get_competidores_relacionados(dominio_actual):
-    conn = psycopg2.connect(Config.DATABASE)
-    cursor = conn.cursor()
-
-    # Buscar medio propio cuyo dominio coincida
-    cursor.execute("""
-        SELECT id FROM medios
-        WHERE tipo = 'propio' AND %s ILIKE CONCAT('%%', REPLACE(REPLACE(REPLACE(REPLACE(url, 'https://', ''), 'http://', ''), 'www.', ''), '/', ''), '%%')
-    """, (dominio_actual,))
-    medio = cursor.fetchone()
-
-    if not medio:
-        conn.close()
-        return []
-
-    medio_id = medio[0]
-
-    # Buscar competidores asociados
-    cursor.execute("""
-        SELECT m.nombre, m.url
-        FROM competidores c
-        JOIN medios m ON c.medio_competidor_id = m.id
-        WHERE c.medio_padre_id = %s
-    """, (medio_id,))
-    resultados = cursor.fetchall()
-
-    conn.close()
-    return [{"nombre": nombre, "url": url} for nombre, url in resultados]
-
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO competidores (medio_competidor_id, medio_padre_id)
+            VALUES (%s, %s)
+            ON CONFLICT DO NOTHING
+        """, (medio_competidor_id, medio_padre_id))
+        conn.commit()
+    cache.invalidar_medio()
+
+def _get_competidores_por_dominio(dominio):
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        # Buscar medio propio por dominio
+        cursor.execute("SELECT id FROM medios WHERE url ILIKE %s AND tipo = 'propio'", [f'%{dominio}%'])
+        medio = cursor.fetchone()
+
+        if not medio:
+            return []
+
+        # Obtener competidores asociados a ese medio propio
+        cursor.execute("""
+            SELECT m.id, m.nombre, m.url
+            FROM competidores c
+            JOIN medios m ON m.id = c.medio_competidor_id
+            WHERE c.medio_padre_id = %s
+        """, [medio['id']])
+        return cursor.fetchall()
+
+def get_competidores_por_dominio(dominio):
+    return cache.obtener(("competidores", dominio), lambda: _get_competidores_por_dominio(dominio))
+
+async def _get_competidores_por_dominio_async(dominio):
+    async with db_async.conexion() as conn:
+        medio = await conn.fetchrow(
+            "SELECT id FROM medios WHERE url ILIKE $1 AND tipo = 'propio'", f'%{dominio}%'
+        )
+        if not medio:
+            return []
+
+        rows = await conn.fetch("""
+            SELECT m.id, m.nombre, m.url
+            FROM competidores c
+            JOIN medios m ON m.id = c.medio_competidor_id
+            WHERE c.medio_padre_id = $1
+        """, medio['id'])
+    return [dict(row) for row in rows]
+
+async def get_competidores_por_dominio_async(dominio):
+    return await cache.obtener_async(("competidores", dominio),
+                                     lambda: _get_competidores_por_dominio_async(dominio))
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from config import Config
+
+class PoolAgotado(Exception):
+    """No se obtuvo conexión del pool dentro de DB_POOL_TIMEOUT segundos"""
+
+# Un pool por proceso: tras el fork de gunicorn cada worker crea el suyo
+_pool = None
+_pool_pid = None
+_semaforo = None
+_lock_pool = threading.Lock()
+
+_lock_metricas = threading.Lock()
+_metricas = {
+    "checkouts": 0,
+    "esperas": 0,
+    "agotamientos": 0,
+    "segundos_espera": 0.0,
+    "en_uso": 0,
+}
+
+def _get_pool():
+    global _pool, _pool_pid, _semaforo
+    if _pool is None or _pool_pid != os.getpid():
+        with _lock_pool:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    Config.DB_POOL_MIN, Config.DB_POOL_MAX, Config.DATABASE
+                )
+                _semaforo = threading.BoundedSemaphore(Config.DB_POOL_MAX)
+                _pool_pid = os.getpid()
+    return _pool, _semaforo
+
+def cerrar_pool():
+    """Cierra las conexiones del pool de este proceso.
+
+    El máster de gunicorn lo llama antes de hacer fork para que ningún worker herede
+    sockets abiertos; el siguiente conexion() crea un pool nuevo.
+    """
+    global _pool, _pool_pid, _semaforo
+    with _lock_pool:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = _pool_pid = _semaforo = None
+
+def _sumar(clave, valor=1):
+    with _lock_metricas:
+        _metricas[clave] += valor
+
+@contextmanager
+def conexion():
+    """Presta una conexión del pool y la devuelve limpia al salir del bloque.
+
+    El llamador hace commit; cualquier transacción abierta al salir se deshace.
+    """
+    pool, semaforo = _get_pool()
+    if not semaforo.acquire(blocking=False):
+        _sumar("esperas")
+        inicio = time.monotonic()
+        obtenido = semaforo.acquire(timeout=Config.DB_POOL_TIMEOUT)
+        _sumar("segundos_espera", time.monotonic() - inicio)
+        if not obtenido:
+            _sumar("agotamientos")
+            raise PoolAgotado(f"Pool de conexiones agotado ({Config.DB_POOL_MAX} en uso)")
+
+    try:
+        conn = pool.getconn()
+    except Exception:
+        semaforo.release()
+        raise
+    _sumar("checkouts")
+    _sumar("en_uso")
+    descartar = False
+    try:
+        yield conn
+    finally:
+        try:
+            if conn.closed:
+                descartar = True
+            elif conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            descartar = True
+        pool.putconn(conn, close=descartar)
+        _sumar("en_uso", -1)
+        semaforo.release()
+
+def get_metricas_pool():
+    with _lock_metricas:
+        metricas = dict(_metricas)
+    metricas["segundos_espera"] = round(metricas["segundos_espera"], 3)
+    metricas["min"] = Config.DB_POOL_MIN
+    metricas["max"] = Config.DB_POOL_MAX
+    return metricas
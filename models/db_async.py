@@ -0,0 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from config import Config
+from models.db import PoolAgotado
+
+# Pool asyncpg del servidor ASGI (asgi.py). Se abre en el lifespan de cada worker, ya
+# dentro de su bucle de eventos, así que nunca se hereda por fork. asyncpg se importa
+# aquí dentro para que el servidor WSGI no lo cargue.
+_estado = {"pool": None}
+
+async def abrir_pool():
+    import asyncpg
+
+    if _estado["pool"] is None:
+        _estado["pool"] = await asyncpg.create_pool(
+            Config.DATABASE,
+            min_size=Config.ASYNC_DB_POOL_MIN,
+            max_size=Config.ASYNC_DB_POOL_MAX
+        )
+    return _estado["pool"]
+
+async def cerrar_pool():
+    pool, _estado["pool"] = _estado["pool"], None
+    if pool is not None:
+        await pool.close()
+
+@asynccontextmanager
+async def conexion():
+    """Presta una conexión del pool asíncrono; sólo para lecturas en autocommit"""
+    pool = _estado["pool"]
+    if pool is None:
+        raise RuntimeError("Pool asíncrono sin abrir: se abre en el lifespan de asgi.py")
+    try:
+        conn = await pool.acquire(timeout=Config.DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PoolAgotado(f"Sin conexión libre tras {Config.DB_POOL_TIMEOUT}s")
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+def get_metricas_pool():
+    pool = _estado["pool"]
+    if pool is None:
+        return None
+    return {
+        "abiertas": pool.get_size(),
+        "libres": pool.get_idle_size(),
+        "min": pool.get_min_size(),
+        "max": pool.get_max_size()
+    }
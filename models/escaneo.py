@@ -0,0 +1,108 @@
+import psycopg2
+import psycopg2.extras
+from config import Config
+from models.db import conexion
+
+# Clave del advisory lock que garantiza un único worker de escaneo en todo el clúster
+LOCK_ESCANER = 7310002
+
+ESTADOS_EN_CURSO = ('pendiente', 'en_curso')
+
+def encolar_escaneo(tipo):
+    """Encola un escaneo salvo que ya haya uno del mismo tipo pendiente o en curso.
+
+    Devuelve (id, nuevo).
+    """
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO escaneos (tipo, estado, creado)
+            VALUES (%s, 'pendiente', NOW())
+            ON CONFLICT (tipo) WHERE estado IN ('pendiente', 'en_curso') DO NOTHING
+            RETURNING id
+        """, (tipo,))
+        fila = cursor.fetchone()
+        if fila:
+            conn.commit()
+            return fila[0], True
+
+        cursor.execute(
+            "SELECT id FROM escaneos WHERE tipo = %s AND estado IN %s ORDER BY id LIMIT 1",
+            (tipo, ESTADOS_EN_CURSO)
+        )
+        fila = cursor.fetchone()
+    return (fila[0] if fila else None), False
+
+def tomar_siguiente_escaneo():
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            UPDATE escaneos SET estado = 'en_curso', iniciado = NOW()
+            WHERE id = (
+                SELECT id FROM escaneos
+                WHERE estado = 'pendiente'
+                ORDER BY id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, tipo
+        """)
+        escaneo = cursor.fetchone()
+        conn.commit()
+    return escaneo
+
+def finalizar_escaneo(escaneo_id, resultado=None, error=None):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE escaneos
+            SET estado = %s, terminado = NOW(), resultado = %s, error = %s
+            WHERE id = %s
+        """, (
+            'error' if error else 'completado',
+            psycopg2.extras.Json(resultado) if resultado is not None else None,
+            error,
+            escaneo_id
+        ))
+        conn.commit()
+
+def recuperar_escaneos_huerfanos():
+    """Marca como error los escaneos que quedaron en curso al morir el worker anterior"""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE escaneos
+            SET estado = 'error', terminado = NOW(), error = 'Worker interrumpido'
+            WHERE estado = 'en_curso'
+        """)
+        conn.commit()
+        return cursor.rowcount
+
+def get_escaneo(escaneo_id):
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("SELECT * FROM escaneos WHERE id = %s", (escaneo_id,))
+        return cursor.fetchone()
+
+def get_ultimos_escaneos(limite=20):
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(
+            "SELECT id, tipo, estado, creado, iniciado, terminado, error FROM escaneos ORDER BY id DESC LIMIT %s",
+            (limite,)
+        )
+        return cursor.fetchall()
+
+def adquirir_lock_escaner():
+    """Conexión dedicada que mantiene el advisory lock del escáner, o None si lo tiene otro proceso.
+
+    El lock es de sesión: dura mientras la conexión siga abierta.
+    """
+    conn = psycopg2.connect(Config.DATABASE)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_try_advisory_lock(%s)", (LOCK_ESCANER,))
+    if cursor.fetchone()[0]:
+        return conn
+    conn.close()
+    return None
@@ -0,0 +1,356 @@
+import logging
+
+import psycopg2.extras
+
+from models.canonico import canonizar_tema, normalizar_nombre
+from models.db import conexion
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock que serializa las migraciones entre workers
+LOCK_ESQUEMA = 7310001
+
+def _sembrar_cobertura(cursor):
+    """Carga inicial de cobertura_temas con normalizar_nombre, igual que guardar_temas.
+
+    Los medios sin cambios (huella igual o 304) no vuelven a pasar por guardar_temas,
+    así que la clave tiene que ser la definitiva desde el principio. También corrige
+    las filas que una versión anterior sembró con lower(nombre).
+    """
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM cobertura_temas)")
+    if not cursor.fetchone()[0]:
+        cursor.execute("SELECT medio_id, nombre, url FROM temas WHERE visible ORDER BY ultima_vez DESC")
+        filas = cursor.fetchall()
+    else:
+        cursor.execute("SELECT medio_id, clave, nombre, url FROM cobertura_temas")
+        erroneas = [fila for fila in cursor.fetchall() if normalizar_nombre(fila[2]) != fila[1]]
+        if not erroneas:
+            return
+        psycopg2.extras.execute_values(cursor, """
+            DELETE FROM cobertura_temas c USING (VALUES %s) AS e (medio_id, clave)
+            WHERE c.medio_id = e.medio_id AND c.clave = e.clave
+        """, [(medio_id, clave) for medio_id, clave, _, _ in erroneas], page_size=1000)
+        filas = [(medio_id, nombre, url) for medio_id, _, nombre, url in erroneas]
+
+    claves = {}
+    for medio_id, nombre, url in filas:
+        clave = normalizar_nombre(nombre)
+        if clave:
+            claves.setdefault((medio_id, clave), (medio_id, clave, nombre, url))
+    if claves:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO cobertura_temas (medio_id, clave, nombre, url) VALUES %s
+            ON CONFLICT DO NOTHING
+        """, list(claves.values()), page_size=1000)
+
+def _ligar_intervalos_a_temas(cursor):
+    """Clave foránea de intervalos_tema a temas con ON DELETE CASCADE, para que la
+    retención de temas no deje intervalos huérfanos. Antes borra los que ya lo son."""
+    cursor.execute("SELECT 1 FROM pg_constraint WHERE conname = 'intervalos_tema_tema_id_fkey'")
+    if cursor.fetchone():
+        return
+    cursor.execute("""
+        DELETE FROM intervalos_tema i
+        WHERE NOT EXISTS (SELECT 1 FROM temas t WHERE t.id = i.tema_id)
+    """)
+    huerfanos = cursor.rowcount
+    cursor.execute("""
+        ALTER TABLE intervalos_tema ADD CONSTRAINT intervalos_tema_tema_id_fkey
+        FOREIGN KEY (tema_id) REFERENCES temas(id) ON DELETE CASCADE
+    """)
+    logger.info(f"intervalos_tema ligada a temas: {huerfanos} intervalos huérfanos eliminados")
+
+def _migrar_identidad_temas(cursor):
+    """Pasa la identidad de los temas de (nombre, url) a (nombre_clave, url canónica).
+
+    Las claves se calculan con canonizar_tema, igual que al guardar un escaneo. Los
+    temas con la misma clave se fusionan en el de primera_vez más antigua, que se
+    queda con la última ultima_vez, la visibilidad y las observaciones e intervalos
+    de los demás. Sube version_temas de los medios cuyos temas cambian. Sólo se
+    ejecuta mientras no exista el índice único nuevo.
+    """
+    cursor.execute("SELECT to_regclass('temas_medio_clave_url_key')")
+    if cursor.fetchone()[0] is not None:
+        return
+
+    cursor.execute("SELECT id, nombre, url FROM temas")
+    canonicos = [(tema_id, *canonizar_tema(nombre, url)) for tema_id, nombre, url in cursor.fetchall()]
+    cursor.execute("""
+        CREATE TEMP TABLE temas_canonicos (
+            id INTEGER PRIMARY KEY, nombre TEXT, nombre_clave TEXT, url TEXT
+        ) ON COMMIT DROP
+    """)
+    psycopg2.extras.execute_values(cursor, "INSERT INTO temas_canonicos VALUES %s", canonicos, page_size=1000)
+
+    # Cada tema de un grupo con duplicados apunta a su superviviente
+    cursor.execute("""
+        CREATE TEMP TABLE temas_fusion ON COMMIT DROP AS
+        SELECT id, superviviente FROM (
+            SELECT t.id,
+                   FIRST_VALUE(t.id) OVER grupo AS superviviente,
+                   COUNT(*) OVER (PARTITION BY t.medio_id, c.nombre_clave, c.url) AS repetidos
+            FROM temas t
+            JOIN temas_canonicos c ON c.id = t.id
+            WINDOW grupo AS (PARTITION BY t.medio_id, c.nombre_clave, c.url ORDER BY t.primera_vez, t.id)
+        ) g
+        WHERE repetidos > 1
+    """)
+    # Las listas y los ETag de /api/temas de los medios con temas fusionados o renombrados cambian
+    cursor.execute("""
+        UPDATE medios SET version_temas = version_temas + 1
+        WHERE id IN (
+            SELECT t.medio_id FROM temas t
+            JOIN temas_canonicos c ON c.id = t.id
+            WHERE t.nombre IS DISTINCT FROM c.nombre OR t.url IS DISTINCT FROM c.url
+            UNION
+            SELECT t.medio_id FROM temas_fusion f
+            JOIN temas t ON t.id = f.id
+        )
+    """)
+    medios_afectados = cursor.rowcount
+    cursor.execute("UPDATE version_cache SET version = version + 1 WHERE id = 1")
+    cursor.execute("""
+        UPDATE temas t
+        SET primera_vez = d.primera_vez, ultima_vez = d.ultima_vez, visible = d.visible
+        FROM (
+            SELECT f.superviviente, MIN(t.primera_vez) AS primera_vez,
+                   MAX(t.ultima_vez) AS ultima_vez, BOOL_OR(t.visible) AS visible
+            FROM temas_fusion f
+            JOIN temas t ON t.id = f.id
+            GROUP BY f.superviviente
+        ) d
+        WHERE t.id = d.superviviente
+    """)
+    # Sólo puede quedar un intervalo abierto por tema: se mantiene el más antiguo del grupo
+    cursor.execute("""
+        UPDATE intervalos_tema i SET fin = NOW()
+        FROM (
+            SELECT i.id, ROW_NUMBER() OVER (PARTITION BY f.superviviente ORDER BY i.inicio, i.id) AS orden
+            FROM intervalos_tema i
+            JOIN temas_fusion f ON f.id = i.tema_id
+            WHERE i.fin IS NULL
+        ) a
+        WHERE i.id = a.id AND a.orden > 1
+    """)
+    for tabla in ("intervalos_tema", "observaciones"):
+        cursor.execute(f"""
+            UPDATE {tabla} x SET tema_id = f.superviviente
+            FROM temas_fusion f
+            WHERE x.tema_id = f.id AND f.id <> f.superviviente
+        """)
+    cursor.execute("DELETE FROM temas t USING temas_fusion f WHERE t.id = f.id AND f.id <> f.superviviente")
+    fusionados = cursor.rowcount
+
+    cursor.execute("DROP INDEX IF EXISTS temas_medio_nombre_url_key")
+    cursor.execute("""
+        UPDATE temas t SET nombre = c.nombre, nombre_clave = c.nombre_clave, url = c.url
+        FROM temas_canonicos c
+        WHERE t.id = c.id
+    """)
+    cursor.execute("ALTER TABLE temas ALTER COLUMN nombre_clave SET NOT NULL")
+    cursor.execute("CREATE UNIQUE INDEX temas_medio_clave_url_key ON temas (medio_id, nombre_clave, url)")
+    logger.info(f"Identidad canónica de temas: {len(canonicos)} temas, {fusionados} duplicados fusionados, "
+                f"{medios_afectados} medios con la versión subida")
+
+# Sentencias idempotentes: tablas base y columnas añadidas después. Las migraciones
+# que necesitan Python son funciones que reciben el cursor de la transacción.
+ESQUEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS medios (
+        id SERIAL PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        url TEXT NOT NULL UNIQUE,
+        tipo TEXT NOT NULL,
+        selector TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS temas (
+        id SERIAL PRIMARY KEY,
+        medio_id INTEGER NOT NULL REFERENCES medios(id) ON DELETE CASCADE,
+        nombre TEXT NOT NULL,
+        url TEXT NOT NULL,
+        primera_vez TIMESTAMP NOT NULL,
+        ultima_vez TIMESTAMP NOT NULL,
+        visible BOOLEAN NOT NULL DEFAULT TRUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS competidores (
+        medio_competidor_id INTEGER NOT NULL REFERENCES medios(id) ON DELETE CASCADE,
+        medio_padre_id INTEGER NOT NULL REFERENCES medios(id) ON DELETE CASCADE,
+        PRIMARY KEY (medio_competidor_id, medio_padre_id)
+    )
+    """,
+    # Validadores HTTP para peticiones condicionales
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS etag TEXT",
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS last_modified TEXT",
+    # Huella de la última lista de temas extraída
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS huella_temas TEXT",
+    # Identidad única de tema para el upsert por lotes; antes se fusionan los duplicados
+    # conservando la primera_vez más antigua
+    """
+    DO $$
+    BEGIN
+        IF to_regclass('temas_medio_nombre_url_key') IS NULL
+           AND to_regclass('temas_medio_clave_url_key') IS NULL THEN
+            UPDATE temas t
+            SET primera_vez = d.primera_vez, ultima_vez = d.ultima_vez, visible = d.visible
+            FROM (
+                SELECT MIN(id) AS id, MIN(primera_vez) AS primera_vez,
+                       MAX(ultima_vez) AS ultima_vez, BOOL_OR(visible) AS visible
+                FROM temas
+                GROUP BY medio_id, nombre, url
+                HAVING COUNT(*) > 1
+            ) d
+            WHERE t.id = d.id;
+
+            DELETE FROM temas t
+            USING temas o
+            WHERE t.medio_id = o.medio_id AND t.nombre = o.nombre AND t.url = o.url AND t.id > o.id;
+
+            CREATE UNIQUE INDEX temas_medio_nombre_url_key ON temas (medio_id, nombre, url);
+        END IF;
+    END $$
+    """,
+    # Host normalizado de cada medio (mismo criterio que medio.normalizar_dominio)
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS dominio TEXT",
+    """
+    UPDATE medios
+    SET dominio = btrim(regexp_replace(
+        replace(replace(replace(lower(url), 'https://', ''), 'http://', ''), 'www.', ''),
+        '/.*', ''))
+    WHERE dominio IS NULL
+    """,
+    "CREATE INDEX IF NOT EXISTS medios_dominio_idx ON medios (dominio)",
+    "CREATE INDEX IF NOT EXISTS temas_medio_ultima_vez_idx ON temas (medio_id, ultima_vez DESC)",
+    # Versiones para invalidar las cachés de lectura de todos los workers
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS version_temas BIGINT NOT NULL DEFAULT 0",
+    """
+    CREATE TABLE IF NOT EXISTS version_cache (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT INTO version_cache (id, version) VALUES (1, 0) ON CONFLICT DO NOTHING",
+    # Paginación por keyset de /visualizar/
+    "CREATE INDEX IF NOT EXISTS temas_ultima_vez_id_idx ON temas (ultima_vez DESC, id DESC)",
+    # Selector aprendido por dominio y su tasa de aciertos
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS selector_aciertos INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS selector_intentos INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS selector_fallos_consecutivos INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS selector_ultimo_acierto TIMESTAMP",
+    # Upsert de medios por url en la importación masiva
+    "CREATE UNIQUE INDEX IF NOT EXISTS medios_url_key ON medios (url)",
+    # Planificación adaptativa del escaneo por medio
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS intervalo_minutos INTEGER",
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS ultimo_escaneo TIMESTAMP",
+    "ALTER TABLE medios ADD COLUMN IF NOT EXISTS proximo_escaneo TIMESTAMP",
+    # Registro de observaciones por escaneo e intervalos en portada de cada tema
+    """
+    CREATE TABLE IF NOT EXISTS scan_runs (
+        id SERIAL PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        inicio TIMESTAMP NOT NULL DEFAULT NOW(),
+        fin TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS observaciones (
+        scan_id INTEGER NOT NULL,
+        medio_id INTEGER NOT NULL,
+        tema_id INTEGER NOT NULL,
+        evento CHAR(1) NOT NULL,
+        momento TIMESTAMP NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS observaciones_tema_idx ON observaciones (tema_id, momento)",
+    "CREATE INDEX IF NOT EXISTS observaciones_medio_idx ON observaciones (medio_id, momento)",
+    # La retención borra las observaciones junto con su escaneo
+    "CREATE INDEX IF NOT EXISTS observaciones_scan_idx ON observaciones (scan_id)",
+    """
+    CREATE TABLE IF NOT EXISTS intervalos_tema (
+        id BIGSERIAL PRIMARY KEY,
+        tema_id INTEGER NOT NULL,
+        medio_id INTEGER NOT NULL,
+        inicio TIMESTAMP NOT NULL,
+        fin TIMESTAMP
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS intervalos_tema_abierto_key ON intervalos_tema (tema_id) WHERE fin IS NULL",
+    "CREATE INDEX IF NOT EXISTS intervalos_tema_tema_idx ON intervalos_tema (tema_id, inicio)",
+    "CREATE INDEX IF NOT EXISTS intervalos_tema_medio_idx ON intervalos_tema (medio_id, inicio)",
+    # Al estrenar el registro, los temas visibles abren intervalo desde su primera_vez
+    """
+    INSERT INTO intervalos_tema (tema_id, medio_id, inicio)
+    SELECT id, medio_id, primera_vez FROM temas
+    WHERE visible AND NOT EXISTS (SELECT 1 FROM intervalos_tema)
+    """,
+    _ligar_intervalos_a_temas,
+    # Estadísticas de cada escaneo: totales en scan_runs y tiempos por etapa de cada medio
+    "ALTER TABLE scan_runs ADD COLUMN IF NOT EXISTS estadisticas JSONB",
+    """
+    CREATE TABLE IF NOT EXISTS scan_runs_medios (
+        scan_id INTEGER NOT NULL REFERENCES scan_runs(id) ON DELETE CASCADE,
+        medio_id INTEGER NOT NULL,
+        estado_http INTEGER,
+        bytes INTEGER NOT NULL DEFAULT 0,
+        temas INTEGER,
+        segundos REAL NOT NULL,
+        conexion REAL NOT NULL DEFAULT 0,
+        descarga REAL NOT NULL DEFAULT 0,
+        parseo REAL NOT NULL DEFAULT 0,
+        selector REAL NOT NULL DEFAULT 0,
+        escritura REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (scan_id, medio_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS scan_runs_medios_medio_idx ON scan_runs_medios (medio_id, scan_id)",
+    # Resumen de temas visibles por medio con el nombre normalizado, para comparar coberturas.
+    # Lo mantiene guardar_temas en la misma transacción; la carga inicial la hace _sembrar_cobertura.
+    """
+    CREATE TABLE IF NOT EXISTS cobertura_temas (
+        medio_id INTEGER NOT NULL REFERENCES medios(id) ON DELETE CASCADE,
+        clave TEXT NOT NULL,
+        nombre TEXT NOT NULL,
+        url TEXT,
+        PRIMARY KEY (medio_id, clave)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS cobertura_temas_clave_idx ON cobertura_temas (clave, medio_id)",
+    _sembrar_cobertura,
+    # Identidad de tema por nombre normalizado y URL canónica (models/canonico.py); sustituye
+    # al índice único sobre (medio_id, nombre, url) y fusiona los duplicados existentes
+    "ALTER TABLE temas ADD COLUMN IF NOT EXISTS nombre_clave TEXT",
+    _migrar_identidad_temas,
+    # Cola de escaneos procesada por worker.py
+    """
+    CREATE TABLE IF NOT EXISTS escaneos (
+        id SERIAL PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        estado TEXT NOT NULL DEFAULT 'pendiente',
+        creado TIMESTAMP NOT NULL DEFAULT NOW(),
+        iniciado TIMESTAMP,
+        terminado TIMESTAMP,
+        resultado JSONB,
+        error TEXT
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS escaneos_tipo_en_curso_key
+    ON escaneos (tipo) WHERE estado IN ('pendiente', 'en_curso')
+    """,
+]
+
+def asegurar_esquema():
+    """Aplica las sentencias de ESQUEMA en una transacción protegida por advisory lock"""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_ESQUEMA,))
+        for sentencia in ESQUEMA:
+            if callable(sentencia):
+                sentencia(cursor)
+            else:
+                cursor.execute(sentencia)
+        conn.commit()
+    logger.info("Esquema de base de datos verificado")
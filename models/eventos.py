@@ -0,0 +1,56 @@
+import json
+import psycopg2
+import psycopg2.extras
+from models.db import conexion
+
+# Canal de LISTEN/NOTIFY por el que el escáner avisa de los cambios de temas
+CANAL_TEMAS = "temas_cambios"
+
+# NOTIFY admite hasta 8000 bytes de payload
+_MAX_PAYLOAD = 7900
+
+def notificar_cambios(cursor, medio_id, aparecidos, desaparecidos, refrescados):
+    """Encola el aviso en la transacción del cursor; se entrega al hacer commit.
+
+    Si la lista de ids no cabe en el payload se avisa sólo de que hay que recargar.
+    """
+    aviso = {
+        "medio_id": medio_id,
+        "aparecidos": aparecidos,
+        "desaparecidos": desaparecidos,
+        "refrescados": refrescados
+    }
+    payload = json.dumps(aviso, separators=(",", ":"))
+    if len(payload) > _MAX_PAYLOAD:
+        payload = json.dumps({"medio_id": medio_id, "recargar": True})
+    cursor.execute("SELECT pg_notify(%s, %s)", (CANAL_TEMAS, payload))
+
+def get_detalle_cambios(aviso):
+    """Completa un aviso con los datos del medio y de los temas aparecidos y desaparecidos"""
+    ids = aviso.get("aparecidos", []) + aviso.get("desaparecidos", [])
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(
+            "SELECT id, nombre, tipo, dominio FROM medios WHERE id = %s",
+            (aviso["medio_id"],)
+        )
+        medio = cursor.fetchone()
+        temas = {}
+        if ids:
+            cursor.execute(
+                "SELECT id, nombre, url, primera_vez, ultima_vez FROM temas WHERE id = ANY(%s)",
+                (ids,)
+            )
+            temas = {t['id']: t for t in cursor.fetchall()}
+    if not medio:
+        return None
+    return {
+        "medio_id": medio['id'],
+        "medio": medio['nombre'],
+        "tipo": medio['tipo'],
+        "dominio": medio['dominio'],
+        "aparecidos": [temas[i] for i in aviso.get("aparecidos", []) if i in temas],
+        "desaparecidos": [temas[i] for i in aviso.get("desaparecidos", []) if i in temas],
+        "refrescados": aviso.get("refrescados", 0),
+        "recargar": aviso.get("recargar", False)
+    }
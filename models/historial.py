@@ -0,0 +1,182 @@
+import psycopg2
+import psycopg2.extras
+from models.db import conexion
+
+# Eventos del registro de observaciones
+APARECE = 'A'
+DESAPARECE = 'D'
+
+def iniciar_scan_run(tipo):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO scan_runs (tipo, inicio) VALUES (%s, NOW()) RETURNING id", (tipo,))
+        scan_id = cursor.fetchone()[0]
+        conn.commit()
+    return scan_id
+
+def registrar_observaciones(scan_id, eventos):
+    """Escribe en bloque los eventos de un escaneo y mantiene los intervalos agregados.
+
+    `eventos` es una lista de (medio_id, tema_id, evento, momento). Un evento APARECE
+    abre un intervalo para el tema y DESAPARECE cierra el que tenga abierto.
+    """
+    with conexion() as conn:
+        cursor = conn.cursor()
+        if eventos:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO observaciones (scan_id, medio_id, tema_id, evento, momento) VALUES %s
+            """, [(scan_id, medio_id, tema_id, evento, momento) for medio_id, tema_id, evento, momento in eventos],
+                page_size=1000)
+
+            aperturas = [(tema_id, medio_id, momento) for medio_id, tema_id, evento, momento in eventos if evento == APARECE]
+            if aperturas:
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO intervalos_tema (tema_id, medio_id, inicio) VALUES %s
+                    ON CONFLICT (tema_id) WHERE fin IS NULL DO NOTHING
+                """, aperturas, page_size=1000)
+
+            cierres = [(tema_id, momento) for medio_id, tema_id, evento, momento in eventos if evento == DESAPARECE]
+            if cierres:
+                psycopg2.extras.execute_values(cursor, """
+                    UPDATE intervalos_tema i SET fin = v.momento
+                    FROM (VALUES %s) AS v (tema_id, momento)
+                    WHERE i.tema_id = v.tema_id AND i.fin IS NULL
+                """, cierres, template="(%s::integer, %s::timestamp)", page_size=1000)
+
+        cursor.execute("UPDATE scan_runs SET fin = NOW() WHERE id = %s", (scan_id,))
+        conn.commit()
+
+def get_historial_tema(tema_id):
+    """Intervalos en portada de un tema y el tiempo total que ha estado visible"""
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT inicio, fin,
+                   EXTRACT(EPOCH FROM COALESCE(fin, NOW()::timestamp) - inicio)::float / 3600 AS horas
+            FROM intervalos_tema
+            WHERE tema_id = %s
+            ORDER BY inicio
+        """, (tema_id,))
+        intervalos = cursor.fetchall()
+    return {
+        "tema_id": tema_id,
+        "intervalos": intervalos,
+        "horas_en_portada": round(sum(i["horas"] for i in intervalos), 2),
+        "apariciones": len(intervalos)
+    }
+
+def get_temas_no_cubiertos(medio_id, desde, hasta):
+    """Temas que los competidores de un medio tuvieron en portada entre desde y hasta
+    y que el medio no llegó a tener en ese periodo (comparando por nombre_clave)"""
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            WITH propios AS (
+                SELECT DISTINCT t.nombre_clave AS clave
+                FROM intervalos_tema i
+                JOIN temas t ON t.id = i.tema_id
+                WHERE i.medio_id = %(medio_id)s
+                  AND i.inicio < %(hasta)s AND COALESCE(i.fin, NOW()::timestamp) > %(desde)s
+            )
+            SELECT t.nombre, t.url, m.id AS medio_id, m.nombre AS medio_nombre,
+                   MIN(i.inicio) AS desde,
+                   SUM(EXTRACT(EPOCH FROM LEAST(COALESCE(i.fin, NOW()::timestamp), %(hasta)s)
+                                         - GREATEST(i.inicio, %(desde)s)))::float / 3600 AS horas
+            FROM competidores c
+            JOIN intervalos_tema i ON i.medio_id = c.medio_competidor_id
+            JOIN temas t ON t.id = i.tema_id
+            JOIN medios m ON m.id = i.medio_id
+            WHERE c.medio_padre_id = %(medio_id)s
+              AND i.inicio < %(hasta)s AND COALESCE(i.fin, NOW()::timestamp) > %(desde)s
+              AND t.nombre_clave NOT IN (SELECT clave FROM propios)
+            GROUP BY t.nombre, t.url, m.id, m.nombre
+            ORDER BY horas DESC
+        """, {"medio_id": medio_id, "desde": desde, "hasta": hasta})
+        return cursor.fetchall()
+
+def guardar_estadisticas_scan_run(scan_id, estadisticas, mediciones):
+    """Totales del escaneo en scan_runs y una fila por medio con sus tiempos por etapa"""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE scan_runs SET estadisticas = %s, fin = COALESCE(fin, NOW()) WHERE id = %s",
+            (psycopg2.extras.Json(estadisticas), scan_id)
+        )
+        if mediciones:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO scan_runs_medios (scan_id, medio_id, estado_http, bytes, temas, segundos,
+                                              conexion, descarga, parseo, selector, escritura)
+                VALUES %s
+                ON CONFLICT (scan_id, medio_id) DO NOTHING
+            """, [
+                (scan_id, m["medio_id"], m["estado_http"], m["bytes"], m["temas"], m["segundos"],
+                 m["etapas"]["conexion"], m["etapas"]["descarga"], m["etapas"]["parseo"],
+                 m["etapas"]["selector"], m["etapas"]["escritura"])
+                for m in mediciones
+            ], page_size=1000)
+        conn.commit()
+
+def get_ultimos_scan_runs():
+    """Último escaneo terminado de cada tipo con sus estadísticas"""
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT DISTINCT ON (tipo) id, tipo, inicio, fin, estadisticas
+            FROM scan_runs
+            WHERE fin IS NOT NULL AND estadisticas IS NOT NULL
+            ORDER BY tipo, id DESC
+        """)
+        return cursor.fetchall()
+
+def get_ultimas_mediciones_medios():
+    """Medición más reciente de cada medio, para detectar los que se vuelven lentos o sin temas"""
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        # Una lectura de scan_runs_medios_medio_idx por medio en lugar de ordenar la tabla entera
+        cursor.execute("""
+            SELECT m.id AS medio_id, m.nombre, s.scan_id, s.estado_http, s.bytes,
+                   s.temas, s.segundos, s.conexion, s.descarga, s.parseo, s.selector, s.escritura
+            FROM medios m
+            CROSS JOIN LATERAL (
+                SELECT * FROM scan_runs_medios
+                WHERE medio_id = m.id
+                ORDER BY scan_id DESC
+                LIMIT 1
+            ) s
+            ORDER BY m.id
+        """)
+        return cursor.fetchall()
+
+def borrar_scan_runs_antiguos_lote(fecha_limite, lote):
+    """Borra como mucho `lote` escaneos iniciados antes de fecha_limite con sus
+    observaciones y sus mediciones por medio (ON DELETE CASCADE).
+
+    Se conserva siempre el último escaneo de cada tipo para /metrics. Devuelve
+    (escaneos borrados, observaciones borradas).
+    """
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH lote AS (
+                SELECT r.id FROM scan_runs r
+                WHERE r.inicio < %s
+                  AND r.id < (SELECT MAX(u.id) FROM scan_runs u WHERE u.tipo = r.tipo)
+                ORDER BY r.id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ),
+            observaciones_borradas AS (
+                DELETE FROM observaciones o USING lote
+                WHERE o.scan_id = lote.id
+                RETURNING 1
+            ),
+            escaneos_borrados AS (
+                DELETE FROM scan_runs r USING lote
+                WHERE r.id = lote.id
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM escaneos_borrados), (SELECT COUNT(*) FROM observaciones_borradas)
+        """, (fecha_limite, lote))
+        escaneos, observaciones = cursor.fetchone()
+        conn.commit()
+    return escaneos, observaciones
@@ -1,55 +1,308 @@
+import re
 import psycopg2
 import psycopg2.extras
-from config import Config
+from models import cache, db_async
+from models.db import conexion
 
-def get_db_connection():
-    conn = psycopg2.connect(Config.DATABASE)
-    return conn
+def normalizar_dominio(d):
+    """Host sin esquema, www. ni ruta: 'https://www.epe.es/es/' → 'epe.es'"""
+    if not d:
+        return ""
+    d = d.lower()
+    d = d.replace("https://", "").replace("http://", "").replace("www.", "")
+    d = re.sub(r"/.*", "", d)  # Eliminar cualquier ruta (/es/, /noticias/, etc.)
+    return d.strip()
 
 def get_all_medios():
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cursor.execute("SELECT id, nombre, url, tipo, selector FROM medios")
-    medios = cursor.fetchall()
-    conn.close()
-    return medios
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("SELECT id, nombre, url, tipo, selector FROM medios")
+        return cursor.fetchall()
+
+async def get_all_medios_async():
+    async with db_async.conexion() as conn:
+        rows = await conn.fetch("SELECT id, nombre, url, tipo, selector FROM medios")
+    return [dict(row) for row in rows]
 
 def add_medio(nombre, url, tipo, selector=None):
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO medios (nombre, url, tipo, selector) VALUES (%s, %s, %s, %s)",
-            (nombre, url, tipo, selector)
-        )
-        conn.commit()
+        with conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO medios (nombre, url, tipo, selector, dominio) VALUES (%s, %s, %s, %s, %s)",
+                (nombre, url, tipo, selector, normalizar_dominio(url))
+            )
+            conn.commit()
+        cache.invalidar_medio()
         return {"mensaje": "Medio agregado correctamente"}, 201
     except psycopg2.IntegrityError:
-        if conn:
-            conn.rollback()
-            conn.close()
         return {"mensaje": "El medio ya existe"}, 409
     except Exception as e:
-        if conn:
-            conn.rollback()
-            conn.close()
         return {"mensaje": f"Error inesperado: {str(e)}"}, 500
 
-def get_medios_stats():
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+TIPOS_MEDIO = ('propio', 'competencia')
+
+def validar_medio(medio):
+    """Devuelve el motivo por el que una fila de importación no es válida, o None"""
+    if not isinstance(medio, dict):
+        return "La fila no es un objeto"
+    for campo in ('nombre', 'url', 'tipo'):
+        valor = medio.get(campo)
+        if valor is not None and not isinstance(valor, str):
+            return f"El campo '{campo}' debe ser texto"
+        if not (valor or "").strip():
+            return f"Falta el campo '{campo}'"
+    if medio.get('selector') is not None and not isinstance(medio['selector'], str):
+        return "El campo 'selector' debe ser texto"
+    if medio['tipo'].strip() not in TIPOS_MEDIO:
+        return f"Tipo no válido: {medio['tipo']}"
+    if not medio['url'].strip().startswith(('http://', 'https://')):
+        return f"URL no válida: {medio['url']}"
+    return None
+
+def importar_medios(medios):
+    """Alta o actualización de muchos medios en una sola transacción.
+
+    Valida todas las filas antes de escribir y hace upsert por url: los existentes
+    actualizan nombre, tipo y, si viene informado, selector. Devuelve el resultado
+    de cada fila ('insertado', 'actualizado', 'duplicado' o 'error').
+    """
+    resultados = []
+    validos = {}
+    repetidas = {}
+    for i, medio in enumerate(medios):
+        error = validar_medio(medio)
+        if error:
+            resultados.append({"fila": i, "url": medio.get('url') if isinstance(medio, dict) else None,
+                               "estado": "error", "error": error})
+            continue
+        url = medio['url'].strip()
+        selector = (medio.get('selector') or "").strip() or None
+        # Con urls repetidas gana la última fila
+        if url in validos:
+            repetidas.setdefault(url, []).append(validos[url][0])
+        validos[url] = (i, (medio['nombre'].strip(), url, medio['tipo'].strip(), selector, normalizar_dominio(url)))
+
+    for url, filas_repetidas in repetidas.items():
+        resultados.extend({"fila": fila, "url": url, "estado": "duplicado", "fila_usada": validos[url][0]}
+                          for fila in filas_repetidas)
+
+    if validos:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            filas = psycopg2.extras.execute_values(cursor, """
+                INSERT INTO medios (nombre, url, tipo, selector, dominio)
+                VALUES %s
+                ON CONFLICT (url) DO UPDATE SET
+                    nombre = EXCLUDED.nombre,
+                    tipo = EXCLUDED.tipo,
+                    dominio = EXCLUDED.dominio,
+                    selector_fallos_consecutivos = CASE
+                        WHEN EXCLUDED.selector IS DISTINCT FROM medios.selector AND EXCLUDED.selector IS NOT NULL THEN 0
+                        ELSE medios.selector_fallos_consecutivos
+                    END,
+                    selector = COALESCE(EXCLUDED.selector, medios.selector)
+                RETURNING id, url, (xmax = 0)
+            """, [valores for _, valores in validos.values()], page_size=1000, fetch=True)
+            conn.commit()
+        cache.invalidar_medio()
+
+        for medio_id, url, insertado in filas:
+            resultados.append({"fila": validos[url][0], "url": url, "id": medio_id,
+                               "estado": "insertado" if insertado else "actualizado"})
+
+    resultados.sort(key=lambda r: r["fila"])
+    return resultados
+
+def resumir_importacion(resultados):
+    resumen = {"insertados": 0, "actualizados": 0, "duplicados": 0, "errores": 0}
+    for r in resultados:
+        resumen[{"insertado": "insertados", "actualizado": "actualizados", "duplicado": "duplicados",
+                 "error": "errores"}[r["estado"]]] += 1
+    return resumen
+
+def get_ids_medios_dominio(dominio):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM medios WHERE dominio = %s", (normalizar_dominio(dominio),))
+        return {medio_id for (medio_id,) in cursor.fetchall()}
+
+def get_validadores_http():
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, etag, last_modified FROM medios WHERE etag IS NOT NULL OR last_modified IS NOT NULL")
+        return {medio_id: (etag, last_modified) for medio_id, etag, last_modified in cursor.fetchall()}
+
+def guardar_validadores_http(medio_id, etag, last_modified):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE medios SET etag = %s, last_modified = %s WHERE id = %s",
+            (etag, last_modified, medio_id)
+        )
+        conn.commit()
+
+def get_huellas_temas():
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, huella_temas FROM medios WHERE huella_temas IS NOT NULL")
+        return dict(cursor.fetchall())
+
+def guardar_huella_temas(medio_id, huella):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE medios SET huella_temas = %s WHERE id = %s", (huella, medio_id))
+        conn.commit()
+
+def get_estado_selectores():
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT dominio, selector, selector_aciertos, selector_intentos, selector_fallos_consecutivos
+            FROM medios
+            WHERE dominio IS NOT NULL
+        """)
+        return {
+            fila["dominio"]: {
+                "selector": fila["selector"],
+                "aciertos": fila["selector_aciertos"],
+                "intentos": fila["selector_intentos"],
+                "fallos_consecutivos": fila["selector_fallos_consecutivos"],
+            }
+            for fila in cursor.fetchall()
+        }
+
+def registrar_resultado_selector(dominio, selector, acierto):
+    """Guarda el selector del dominio y actualiza su tasa de aciertos"""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE medios SET
+                selector_fallos_consecutivos = CASE
+                    WHEN %(acierto)s THEN 0
+                    WHEN selector IS DISTINCT FROM %(selector)s THEN 1
+                    ELSE selector_fallos_consecutivos + 1
+                END,
+                selector = %(selector)s,
+                selector_intentos = selector_intentos + 1,
+                selector_aciertos = selector_aciertos + CASE WHEN %(acierto)s THEN 1 ELSE 0 END,
+                selector_ultimo_acierto = CASE WHEN %(acierto)s THEN NOW() ELSE selector_ultimo_acierto END
+            WHERE dominio = %(dominio)s
+        """, {"dominio": dominio, "selector": selector, "acierto": acierto})
+        conn.commit()
+
+def get_salud_selectores(fallos_max):
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT id, nombre, dominio, tipo, selector,
+                   selector_aciertos AS aciertos, selector_intentos AS intentos,
+                   selector_fallos_consecutivos AS fallos_consecutivos,
+                   selector_ultimo_acierto AS ultimo_acierto,
+                   ROUND(selector_aciertos::numeric / NULLIF(selector_intentos, 0), 3)::float AS tasa_aciertos,
+                   (selector IS NULL OR selector_fallos_consecutivos >= %s) AS roto
+            FROM medios
+            ORDER BY roto DESC, tasa_aciertos ASC NULLS FIRST, nombre
+        """, (fallos_max,))
+        return cursor.fetchall()
 
-    cursor.execute("SELECT COUNT(*) as total FROM medios")
-    total_medios = cursor.fetchone()['total']
+def get_medios_escaneo(solo_competidores=False, frescura_minutos=0):
+    """Medios distintos que visitar en un escaneo.
+
+    Con `solo_competidores`, los competidores de algún medio propio, una sola vez
+    aunque tengan varios padres. `reciente` indica si se escanearon hace menos de
+    `frescura_minutos`.
+    """
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT m.id, m.nombre, m.url, m.tipo, m.selector,
+                   COALESCE(m.ultimo_escaneo > NOW() - make_interval(mins => %(frescura)s), FALSE) AS reciente
+            FROM medios m
+            WHERE NOT %(solo_competidores)s OR EXISTS (
+                SELECT 1 FROM competidores c
+                JOIN medios p ON p.id = c.medio_padre_id
+                WHERE c.medio_competidor_id = m.id AND p.tipo = 'propio'
+            )
+            ORDER BY m.ultimo_escaneo NULLS FIRST, m.id
+        """, {"frescura": frescura_minutos, "solo_competidores": solo_competidores})
+        return cursor.fetchall()
+
+def get_medios_pendientes():
+    """Medios cuyo próximo escaneo planificado ya ha llegado"""
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT id, nombre, url, tipo, selector FROM medios
+            WHERE proximo_escaneo IS NULL OR proximo_escaneo <= NOW()
+            ORDER BY proximo_escaneo NULLS FIRST
+        """)
+        return cursor.fetchall()
+
+def marcar_medio_escaneado(medio_id, intervalo_defecto):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE medios
+            SET ultimo_escaneo = NOW(),
+                proximo_escaneo = NOW() + make_interval(mins => COALESCE(intervalo_minutos, %s))
+            WHERE id = %s
+        """, (intervalo_defecto, medio_id))
+        conn.commit()
+
+def recalcular_intervalos(ventana_horas, minimo, maximo, cambios_por_escaneo=1):
+    """Asigna a cada medio un intervalo de escaneo según los cambios observados en sus temas.
+
+    Un cambio es un tema que apareció (primera_vez) o dejó de estar visible (ultima_vez)
+    dentro de la ventana. El intervalo busca ~cambios_por_escaneo cambios entre escaneos,
+    acotado a [minimo, maximo] minutos; los medios sin cambios van al máximo.
+    """
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            WITH cambios AS (
+                SELECT m.id,
+                       COUNT(t.id) FILTER (WHERE t.primera_vez >= NOW() - make_interval(hours => %(ventana)s))
+                       + COUNT(t.id) FILTER (WHERE NOT t.visible AND t.ultima_vez >= NOW() - make_interval(hours => %(ventana)s))
+                       AS total
+                FROM medios m
+                LEFT JOIN temas t ON t.medio_id = m.id
+                GROUP BY m.id
+            )
+            UPDATE medios m
+            SET intervalo_minutos = LEAST(GREATEST(
+                    COALESCE(ROUND(60.0 * %(ventana)s * %(por_escaneo)s / NULLIF(c.total, 0)), %(maximo)s),
+                    %(minimo)s), %(maximo)s)
+            FROM cambios c
+            WHERE c.id = m.id
+            RETURNING m.id, m.nombre, m.intervalo_minutos, c.total AS cambios
+        """, {"ventana": ventana_horas, "por_escaneo": cambios_por_escaneo, "minimo": minimo, "maximo": maximo})
+        intervalos = cursor.fetchall()
+        conn.commit()
+    return intervalos
+
+def get_planificacion():
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT id, nombre, tipo, intervalo_minutos, ultimo_escaneo, proximo_escaneo
+            FROM medios
+            ORDER BY proximo_escaneo NULLS FIRST, nombre
+        """)
+        return cursor.fetchall()
+
+def get_medios_stats():
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-    cursor.execute("SELECT COUNT(*) as total FROM medios WHERE tipo = 'propio'")
-    medios_propios = cursor.fetchone()['total']
+        cursor.execute("SELECT COUNT(*) as total FROM medios")
+        total_medios = cursor.fetchone()['total']
 
-    cursor.execute("SELECT COUNT(*) as total FROM medios WHERE tipo = 'competencia'")
-    medios_competencia = cursor.fetchone()['total']
+        cursor.execute("SELECT COUNT(*) as total FROM medios WHERE tipo = 'propio'")
+        medios_propios = cursor.fetchone()['total']
 
-    conn.close()
+        cursor.execute("SELECT COUNT(*) as total FROM medios WHERE tipo = 'competencia'")
+        medios_competencia = cursor.fetchone()['total']
 
     return {
         'total': total_medios,
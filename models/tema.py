@@ -1,179 +1,240 @@
 import psycopg2
 import psycopg2.extras
 import datetime
-import urllib.parse
-from config import Config
-from bs4 import BeautifulSoup
-
-SELECTORES_POR_DOMINIO = {
-    "sport.es": ".news",
-    "epe.es": ".ft-org-header-sidenav-body-header-nav",
-    "elperiodico.com": ".ft-org-header-nav__list",
-}
-
-def extraer_temas_visibles(html, url):
-    import urllib.parse
-    import logging
-    from bs4 import BeautifulSoup
-
-    if not url:
-        logging.error("[Extractor] La URL es vacía o None.")
-        return []
-
-    try:
-        parsed = urllib.parse.urlparse(url)
-        hostname = parsed.hostname or ""
-        if not hostname:
-            logging.error(f"[Extractor] No se pudo extraer hostname desde la URL: {url}")
-            return []
-
-        dominio = hostname.replace("www.", "").lower()
-        selector = None
-
-        for clave in SELECTORES_POR_DOMINIO:
-            if clave in dominio:
-                selector = SELECTORES_POR_DOMINIO[clave]
-                break
-
-        logging.info(f"[Extractor] Dominio detectado: {dominio} → usando selector: {selector}")
-
-        temas = []
-        soup = BeautifulSoup(html, "html.parser")
-
-        if selector:
-            contenedor = soup.select_one(selector)
-            if contenedor:
-                enlaces = contenedor.find_all("a")
-                for i, link in enumerate(enlaces):
-                    texto = link.get_text(strip=True)
-                    href = link.get("href")
-
-                    if "elperiodico.com" in dominio and i == 0:
-                        continue  # Ignorar "Es noticia"
-
-                    if texto and href and len(texto) < 50:
-                        temas.append({
-                            "nombre": texto,
-                            "url": href if href.startswith("http") else f"https://{hostname}{href}"
-                        })
-            else:
-                logging.warning(f"[Extractor] Selector '{selector}' no encontrado en el HTML.")
-        else:
-            logging.warning(f"[Extractor] No hay selector definido para el dominio: {dominio}")
-
-        return temas
-
-    except Exception as e:
-        logging.exception(f"[Extractor] Excepción inesperada al procesar la URL: {url} → {e}")
-        return []
-
-
-
-
-
-
-def get_db_connection():
-    return psycopg2.connect(Config.DATABASE)
-
-# Antes del escaneo por medio, resetear visibilidad
-def resetear_visibilidad_por_medio(medio_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE temas SET visible = FALSE WHERE medio_id = %s", (medio_id,))
-    conn.commit()
-    conn.close()
+from models import cache, db_async
+from models.canonico import canonizar_tema
+from models.cobertura import actualizar_cobertura_medio
+from models.eventos import notificar_cambios
+from models.db import conexion
+from models.medio import normalizar_dominio
+
+# Los temas visibles no han cambiado: sólo se refresca ultima_vez
+def tocar_temas_visibles(medio_id):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE temas SET ultima_vez = %s WHERE medio_id = %s AND visible",
+            (datetime.datetime.now(), medio_id)
+        )
+        conn.commit()
 
 # Agregar o actualizar tema
 def add_or_update_tema(medio_id, nombre, url):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id FROM temas
-        WHERE medio_id = %s AND nombre = %s AND url = %s
-    """, (medio_id, nombre, url))
-    row = cursor.fetchone()
-
-    now = datetime.datetime.now()
-    if row:
+    nombre, nombre_clave, url = canonizar_tema(nombre, url)
+    with conexion() as conn:
+        cursor = conn.cursor()
         cursor.execute("""
-            UPDATE temas
-            SET ultima_vez = %s, visible = TRUE
-            WHERE id = %s
-        """, (now, row[0]))
-    else:
+            SELECT id FROM temas
+            WHERE medio_id = %s AND nombre_clave = %s AND url = %s
+        """, (medio_id, nombre_clave, url))
+        row = cursor.fetchone()
+
+        now = datetime.datetime.now()
+        if row:
+            cursor.execute("""
+                UPDATE temas
+                SET ultima_vez = %s, visible = TRUE
+                WHERE id = %s
+            """, (now, row[0]))
+        else:
+            cursor.execute("""
+                INSERT INTO temas (medio_id, nombre, nombre_clave, url, primera_vez, ultima_vez, visible)
+                VALUES (%s, %s, %s, %s, %s, %s, TRUE)
+            """, (medio_id, nombre, nombre_clave, url, now, now))
+
+        conn.commit()
+
+# Guardar en una transacción todos los temas extraídos de un medio
+def guardar_temas(medio_id, temas):
+    """Upsert set-based de los temas de un medio.
+
+    Inserta los nuevos, refresca ultima_vez/visible de los existentes y oculta los
+    que ya no aparecen. Un tema se identifica por su nombre_clave y su URL canónica,
+    así que las variantes de un mismo tema se guardan una sola vez. Devuelve los
+    contadores insertados/refrescados/ocultados y los ids de los temas que han
+    aparecido o desaparecido de la portada.
+    """
+    ahora = datetime.datetime.now()
+    canonicos = {}
+    for nombre, url in temas:
+        nombre, nombre_clave, url = canonizar_tema(nombre, url)
+        canonicos.setdefault((nombre_clave, url), nombre)
+    filas = [(medio_id, nombre, nombre_clave, url, ahora, ahora) for (nombre_clave, url), nombre in canonicos.items()]
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM temas WHERE medio_id = %s AND visible", (medio_id,))
+        visibles_antes = {tema_id for (tema_id,) in cursor.fetchall()}
+        resultados = []
+        if filas:
+            resultados = psycopg2.extras.execute_values(cursor, """
+                INSERT INTO temas (medio_id, nombre, nombre_clave, url, primera_vez, ultima_vez, visible)
+                VALUES %s
+                ON CONFLICT (medio_id, nombre_clave, url)
+                DO UPDATE SET ultima_vez = EXCLUDED.ultima_vez, visible = TRUE
+                RETURNING id, (xmax = 0)
+            """, filas, template="(%s, %s, %s, %s, %s, %s, TRUE)", page_size=len(filas), fetch=True)
         cursor.execute("""
-            INSERT INTO temas (medio_id, nombre, url, primera_vez, ultima_vez, visible)
-            VALUES (%s, %s, %s, %s, %s, TRUE)
-        """, (medio_id, nombre, url, now, now))
-
-    conn.commit()
-    conn.close()
-
-def get_temas_visualizacion(medio_id=None, tipo_medio='', visible=None, page=1, per_page=20):
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    offset = (page - 1) * per_page
-    condiciones = []
-    params = []
-
-    ids_filtrados = []
-
+            UPDATE temas SET visible = FALSE
+            WHERE medio_id = %s AND visible AND ultima_vez < %s
+            RETURNING id
+        """, (medio_id, ahora))
+        desaparecidos = [tema_id for (tema_id,) in cursor.fetchall()]
+        aparecidos = [tema_id for tema_id, _ in resultados if tema_id not in visibles_antes]
+        actualizar_cobertura_medio(cursor, medio_id, [(nombre, url) for (_, url), nombre in canonicos.items()])
+        notificar_cambios(cursor, medio_id, aparecidos, desaparecidos, len(resultados) - len(aparecidos))
+        conn.commit()
+
+    insertados = sum(1 for _, insertado in resultados if insertado)
+    return {
+        "insertados": insertados,
+        "refrescados": len(resultados) - insertados,
+        "ocultados": len(desaparecidos),
+        "momento": ahora,
+        "aparecidos": aparecidos,
+        "desaparecidos": desaparecidos
+    }
+
+def get_tipos_medio():
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT tipo FROM medios")
+        return [tipo for (tipo,) in cursor.fetchall()]
+
+def borrar_temas_antiguos_lote(tipo, fecha_limite, lote):
+    """Borra como mucho `lote` temas de medios de `tipo` no vistos desde fecha_limite.
+
+    Cada lote es una transacción corta; las filas bloqueadas por el escaneo se saltan
+    y los intervalos_tema de los temas borrados caen en cascada. En la misma transacción sube version_temas de los medios afectados, porque sus
+    listas (y los ETag de /api/temas) cambian. Devuelve (filas borradas, bytes de
+    esas filas, ids de los medios afectados).
+    """
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH lote AS (
+                SELECT t.id FROM temas t
+                JOIN medios m ON m.id = t.medio_id
+                WHERE m.tipo = %s AND t.ultima_vez < %s
+                ORDER BY t.id
+                LIMIT %s
+                FOR UPDATE OF t SKIP LOCKED
+            ),
+            borrados AS (
+                DELETE FROM temas t USING lote
+                WHERE t.id = lote.id
+                RETURNING t.medio_id, pg_column_size(t.*) AS tam
+            ),
+            versiones AS (
+                UPDATE medios SET version_temas = version_temas + 1
+                WHERE id IN (SELECT medio_id FROM borrados)
+                RETURNING id
+            )
+            SELECT (SELECT COUNT(*) FROM borrados),
+                   (SELECT COALESCE(SUM(tam), 0) FROM borrados),
+                   (SELECT COALESCE(array_agg(id), '{}') FROM versiones)
+        """, (tipo, fecha_limite, lote))
+        filas, tam, medios = cursor.fetchone()
+        conn.commit()
+    return filas, int(tam), medios
+
+def _cargar_snapshot_medios():
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("SELECT id, nombre, tipo FROM medios ORDER BY nombre")
+        medios = cursor.fetchall()
+    stats = {
+        "total": len(medios),
+        "propios": sum(1 for m in medios if m["tipo"] == "propio"),
+        "competencia": sum(1 for m in medios if m["tipo"] == "competencia"),
+    }
+    return medios, stats
+
+def get_snapshot_medios():
+    """Lista de medios y sus contadores, cacheados hasta la próxima invalidación"""
+    return cache.obtener(("medios_snapshot",), _cargar_snapshot_medios)
+
+def _filtro_medios(medio_id, tipo_medio):
+    """Condición SQL sobre medios m para los filtros de /visualizar/ (usa %(medio_id)s y %(tipo)s)"""
     # Medio + competencia → sólo sus competidores
     if medio_id and tipo_medio == 'competencia':
-        cursor.execute("SELECT medio_competidor_id FROM competidores WHERE medio_padre_id = %s", (medio_id,))
-        rows = cursor.fetchall()
-        ids_filtrados = [row['medio_competidor_id'] for row in rows]
-        if not ids_filtrados:
-            ids_filtrados = [-1]
-        condiciones.append("m.id = ANY(%s)")
-        params.append(ids_filtrados)
-        condiciones.append("m.tipo = %s")
-        params.append('competencia')
-
-    # Medio + todos → propio + sus competidores
+        return """
+            m.tipo = 'competencia'
+            AND m.id IN (SELECT medio_competidor_id FROM competidores WHERE medio_padre_id = %(medio_id)s)
+        """
+    # Medio + todos → propio + sus competidores (o sólo el medio si no es propio)
     elif medio_id and tipo_medio == '':
-        cursor.execute("SELECT tipo FROM medios WHERE id = %s", (medio_id,))
-        tipo_base = cursor.fetchone()
-        if tipo_base and tipo_base["tipo"] == "propio":
-            cursor.execute("SELECT medio_competidor_id FROM competidores WHERE medio_padre_id = %s", (medio_id,))
-            rows = cursor.fetchall()
-            ids_competidores = [row['medio_competidor_id'] for row in rows]
-            ids_filtrados = [medio_id] + ids_competidores
-            condiciones.append("m.id = ANY(%s)")
-            params.append(ids_filtrados)
-        else:
-            condiciones.append("m.id = %s")
-            params.append(medio_id)
-
+        return """
+            m.id = %(medio_id)s
+            OR (
+                EXISTS (SELECT 1 FROM medios b WHERE b.id = %(medio_id)s AND b.tipo = 'propio')
+                AND m.id IN (SELECT medio_competidor_id FROM competidores WHERE medio_padre_id = %(medio_id)s)
+            )
+        """
     else:
+        condiciones = ["TRUE"]
         if tipo_medio:
-            condiciones.append("m.tipo = %s")
-            params.append(tipo_medio)
+            condiciones.append("m.tipo = %(tipo)s")
         if medio_id:
-            condiciones.append("m.id = %s")
-            params.append(medio_id)
+            condiciones.append("m.id = %(medio_id)s")
+        return " AND ".join(condiciones)
+
+def get_ids_medios_seleccion(medio_id=None, tipo_medio=''):
+    """Ids de los medios que entran en los filtros de /visualizar/"""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT m.id FROM medios m WHERE {_filtro_medios(medio_id, tipo_medio)}",
+            {"medio_id": medio_id, "tipo": tipo_medio}
+        )
+        return {medio for (medio,) in cursor.fetchall()}
+
+def get_temas_visualizacion(medio_id=None, tipo_medio='', visible=None, page=1, per_page=20, despues=None):
+    """Página de temas para /visualizar/ resuelta en una sola consulta.
+
+    `despues` es el cursor (ultima_vez, id) del último tema de la página anterior;
+    si se pasa, se pagina por keyset en lugar de OFFSET.
+    """
+    params = {"medio_id": medio_id, "tipo": tipo_medio, "limite": per_page}
+    filtro_medios = _filtro_medios(medio_id, tipo_medio)
 
     # 👁️ Filtro de visibilidad
+    filtro_visible = ""
     if visible in ('true', 'false'):
-        condiciones.append("t.visible = %s")
-        params.append(visible == 'true')
+        filtro_visible = "AND t.visible = %(visible)s"
+        params["visible"] = visible == 'true'
 
-    where_clause = " WHERE " + " AND ".join(condiciones) if condiciones else ""
+    if despues:
+        paginacion = "WHERE (f.ultima_vez, f.id) < (%(cursor_fecha)s, %(cursor_id)s)"
+        params["cursor_fecha"], params["cursor_id"] = despues
+        desplazamiento = ""
+    else:
+        paginacion = ""
+        desplazamiento = "OFFSET %(offset)s"
+        params["offset"] = (page - 1) * per_page
 
+    # El total se calcula con la ventana antes de aplicar el cursor para que no dependa de la página
     query = f"""
-    SELECT t.id, t.nombre, t.url, t.primera_vez, t.ultima_vez, t.visible,
-           m.nombre as medio_nombre, m.url as medio_url, m.tipo as medio_tipo, m.id as medio_id
-    FROM temas t
-    JOIN medios m ON t.medio_id = m.id
-    {where_clause}
-    ORDER BY t.ultima_vez DESC
-    LIMIT %s OFFSET %s
+    WITH seleccion AS (
+        SELECT m.id FROM medios m WHERE {filtro_medios}
+    ),
+    filtrados AS (
+        SELECT t.id, t.nombre, t.url, t.primera_vez, t.ultima_vez, t.visible, t.medio_id,
+               COUNT(*) OVER () AS total
+        FROM temas t
+        WHERE t.medio_id IN (SELECT id FROM seleccion) {filtro_visible}
+    )
+    SELECT f.*, m.nombre as medio_nombre, m.url as medio_url, m.tipo as medio_tipo
+    FROM filtrados f
+    JOIN medios m ON f.medio_id = m.id
+    {paginacion}
+    ORDER BY f.ultima_vez DESC, f.id DESC
+    LIMIT %(limite)s {desplazamiento}
     """
 
-    params.extend([per_page, offset])
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
 
     temas = []
     ahora = datetime.datetime.now()
@@ -201,59 +262,82 @@ def get_temas_visualizacion(medio_id=None, tipo_medio='', visible=None, page=1,
             'visible': row['visible']
         })
 
-    cursor.execute("SELECT id, nombre, tipo FROM medios ORDER BY nombre")
-    medios = cursor.fetchall()
+    # Con la página vacía no hay fila de la que leer el total de la ventana
+    total_temas = rows[0]['total'] if rows else 0
+    siguiente = None
+    if len(rows) == per_page:
+        siguiente = f"{rows[-1]['ultima_vez'].isoformat()}_{rows[-1]['id']}"
 
-    cursor.execute("SELECT COUNT(*) as total FROM temas")
-    total_temas = cursor.fetchone()['total']
+    medios, medios_stats = get_snapshot_medios()
 
-    cursor.execute("SELECT COUNT(*) FILTER (WHERE tipo = 'propio') as propios, COUNT(*) FILTER (WHERE tipo = 'competencia') as competencia, COUNT(*) as total FROM medios")
-    medios_stats = cursor.fetchone()
+    return temas, medios, {"temas": {"total": total_temas, "siguiente": siguiente}, "medios": medios_stats}
 
-    conn.close()
 
-    return temas, medios, {"temas": {"total": total_temas}, "medios": medios_stats}
 
+def _cargar_temas_por_dominio(dominio_limpio):
+    with conexion() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(
+            "SELECT id, version_temas FROM medios WHERE dominio = %s ORDER BY id",
+            (dominio_limpio,)
+        )
+        medios = cursor.fetchall()
+        if not medios:
+            return "", []
 
+        cursor.execute("""
+            SELECT nombre, url, primera_vez
+            FROM temas
+            WHERE medio_id = ANY(%s)
+            ORDER BY ultima_vez DESC
+        """, ([m['id'] for m in medios],))
+        rows = cursor.fetchall()
 
-def get_temas_por_dominio(dominio):
-    import re
-
-    def normalizar_dominio(d):
-        if not d:
-            return ""
-        d = d.lower()
-        d = d.replace("https://", "").replace("http://", "").replace("www.", "")
-        d = re.sub(r"/.*", "", d)  # Eliminar cualquier ruta (/es/, /noticias/, etc.)
-        return d.strip()
-
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    version = ",".join(f"{m['id']}:{m['version_temas']}" for m in medios)
+    return version, rows
 
+def get_datos_temas_por_dominio(dominio):
+    """(version, filas) de los temas del dominio; version cambia con cada escaneo que los modifica"""
     dominio_limpio = normalizar_dominio(dominio)
+    return cache.obtener(("temas", dominio_limpio), lambda: _cargar_temas_por_dominio(dominio_limpio))
+
+async def _cargar_temas_por_dominio_async(dominio_limpio):
+    async with db_async.conexion() as conn:
+        medios = await conn.fetch(
+            "SELECT id, version_temas FROM medios WHERE dominio = $1 ORDER BY id",
+            dominio_limpio
+        )
+        if not medios:
+            return "", []
+
+        rows = await conn.fetch("""
+            SELECT nombre, url, primera_vez
+            FROM temas
+            WHERE medio_id = ANY($1::int[])
+            ORDER BY ultima_vez DESC
+        """, [m['id'] for m in medios])
+
+    version = ",".join(f"{m['id']}:{m['version_temas']}" for m in medios)
+    return version, [dict(row) for row in rows]
+
+async def get_datos_temas_por_dominio_async(dominio):
+    """get_datos_temas_por_dominio() para el servidor ASGI; comparte la entrada de caché"""
+    dominio_limpio = normalizar_dominio(dominio)
+    return await cache.obtener_async(("temas", dominio_limpio),
+                                     lambda: _cargar_temas_por_dominio_async(dominio_limpio))
 
-    query = """
-    SELECT t.id, t.nombre, t.url, t.primera_vez, t.ultima_vez,
-           m.nombre as medio_nombre, m.url as medio_url, m.tipo as medio_tipo, m.id as medio_id
-    FROM temas t
-    JOIN medios m ON t.medio_id = m.id
-    ORDER BY t.ultima_vez DESC
-    """
-
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
+def formatear_temas_compacto(rows):
+    """Formato reducido para la extensión: el cliente calcula el color a partir de p"""
+    return [
+        {"t": row['nombre'], "h": row['url'], "p": int(row['primera_vez'].timestamp())}
+        for row in rows
+    ]
 
+def formatear_temas(rows):
     ahora = datetime.datetime.now()
     temas = []
 
     for row in rows:
-        medio_url = row['medio_url'] or ""
-        medio_limpio = normalizar_dominio(medio_url)
-
-        if dominio_limpio != medio_limpio:
-            continue
-
         duracion_horas = (ahora - row['primera_vez']).total_seconds() / 3600
         if duracion_horas < 4:
             estado = "verde"
@@ -275,3 +359,7 @@ def get_temas_por_dominio(dominio):
 
     return temas
 
+def get_temas_por_dominio(dominio):
+    # duracion_horas y estado dependen de la hora actual: se calculan fuera de la caché
+    version, rows = get_datos_temas_por_dominio(dominio)
+    return formatear_temas(rows)
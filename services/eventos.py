@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+
+from config import Config
+from models.eventos import CANAL_TEMAS, get_detalle_cambios
+
+logger = logging.getLogger(__name__)
+
+# Suscriptores de este proceso: {cola: ids de medios que le interesan, o None para todos}
+_suscriptores = {}
+_lock = threading.Lock()
+_escucha = {"pid": None}
+
+class DemasiadosSuscriptores(Exception):
+    pass
+
+def _escuchar():
+    """Hilo con una conexión dedicada en LISTEN que reparte cada aviso a los suscriptores"""
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(Config.DATABASE)
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {CANAL_TEMAS}")
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _repartir(json.loads(conn.notifies.pop(0).payload))
+        except Exception as e:
+            logger.error(f"Escucha de eventos interrumpida, reintentando: {e}")
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                conn.close()
+
+def _repartir(aviso):
+    with _lock:
+        interesados = [cola for cola, medios in _suscriptores.items()
+                       if medios is None or aviso["medio_id"] in medios]
+    if not interesados:
+        return
+    evento = get_detalle_cambios(aviso)
+    if evento is None:
+        return
+    for cola in interesados:
+        try:
+            cola.put_nowait(evento)
+        except queue.Full:
+            # Cliente que no consume: se le pide recargar en vez de acumular eventos
+            with cola.mutex:
+                cola.queue.clear()
+            cola.put_nowait({"medio_id": evento["medio_id"], "recargar": True})
+        avisar = getattr(cola, "avisar", None)
+        if avisar is not None:
+            avisar()
+
+def _asegurar_escucha():
+    # Tras un fork el hilo no existe en el hijo: se arranca uno por proceso
+    with _lock:
+        if _escucha["pid"] == os.getpid():
+            return
+        _escucha["pid"] = os.getpid()
+    threading.Thread(target=_escuchar, name="eventos-temas", daemon=True).start()
+
+def suscribir(medios=None, maximo=None, avisar=None):
+    """Cola que recibe los cambios de temas de `medios` (conjunto de ids, None = todos).
+
+    `maximo` limita los suscriptores del proceso (EVENTOS_MAX_SUSCRIPTORES por defecto).
+    `avisar` se llama desde el hilo de escucha tras cada evento encolado; lo usa el
+    servidor ASGI para despertar al flujo en su bucle de eventos.
+    """
+    maximo = Config.EVENTOS_MAX_SUSCRIPTORES if maximo is None else maximo
+    _asegurar_escucha()
+    cola = queue.Queue(maxsize=100)
+    cola.avisar = avisar
+    with _lock:
+        if len(_suscriptores) >= maximo:
+            raise DemasiadosSuscriptores(f"Máximo de {maximo} suscriptores alcanzado")
+        _suscriptores[cola] = medios
+    return cola
+
+def cancelar(cola):
+    with _lock:
+        _suscriptores.pop(cola, None)
+
+def _formato_compacto(evento):
+    return {
+        "m": evento["medio_id"],
+        "a": [{"t": t['nombre'], "h": t['url'], "p": int(t['primera_vez'].timestamp())}
+              for t in evento.get("aparecidos", [])],
+        "d": [{"t": t['nombre'], "h": t['url']} for t in evento.get("desaparecidos", [])],
+        "r": evento.get("refrescados", 0),
+        **({"recargar": True} if evento.get("recargar") else {})
+    }
+
+def _mensaje_sse(evento, compacto):
+    datos = _formato_compacto(evento) if compacto else evento
+    return f"event: temas\ndata: {json.dumps(datos, default=lambda v: v.isoformat())}\n\n"
+
+_INICIO_SSE = "retry: 5000\n\n"
+_LATIDO_SSE = ": latido\n\n"
+
+def flujo_sse(cola, compacto=False):
+    """Generador de Server-Sent Events: un evento 'temas' por cambio y un latido periódico.
+
+    Corta la conexión tras EVENTOS_DURACION_MAX; EventSource reconecta solo. Ocupa un
+    hilo del worker mientras dura: en el servidor ASGI se usa flujo_sse_async().
+    """
+    fin = time.monotonic() + Config.EVENTOS_DURACION_MAX
+    try:
+        yield _INICIO_SSE
+        while time.monotonic() < fin:
+            try:
+                evento = cola.get(timeout=Config.EVENTOS_LATIDO)
+            except queue.Empty:
+                yield _LATIDO_SSE
+                continue
+            yield _mensaje_sse(evento, compacto)
+    finally:
+        cancelar(cola)
+
+def suscribir_async(medios=None):
+    """suscribir() para el bucle de eventos actual: devuelve (cola, despertador)"""
+    bucle = asyncio.get_running_loop()
+    despertador = asyncio.Event()
+    cola = suscribir(medios, avisar=lambda: bucle.call_soon_threadsafe(despertador.set))
+    return cola, despertador
+
+async def flujo_sse_async(cola, despertador, compacto=False):
+    """Como flujo_sse() pero esperando en el bucle de eventos, sin ocupar un hilo"""
+    fin = time.monotonic() + Config.EVENTOS_DURACION_MAX
+    try:
+        yield _INICIO_SSE
+        while time.monotonic() < fin:
+            # Se limpia antes de mirar la cola: un evento que llegue después vuelve a activarlo
+            despertador.clear()
+            try:
+                evento = cola.get_nowait()
+            except queue.Empty:
+                try:
+                    await asyncio.wait_for(despertador.wait(), timeout=Config.EVENTOS_LATIDO)
+                except asyncio.TimeoutError:
+                    yield _LATIDO_SSE
+                continue
+            yield _mensaje_sse(evento, compacto)
+    finally:
+        cancelar(cola)
@@ -0,0 +1,188 @@
+import codecs
+import logging
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+from services import metricas
+
+# Backend de parseo: selectolax si está instalado, si no lxml y, en último caso, html.parser
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+try:
+    import lxml  # noqa: F401
+    BS4_BACKEND = "lxml"
+except ImportError:
+    BS4_BACKEND = "html.parser"
+
+BACKEND = "selectolax" if SelectolaxParser else BS4_BACKEND
+
+logger = logging.getLogger(__name__)
+
+_FIN_CABECERA = re.compile(r"</header\s*>", re.IGNORECASE)
+
+def _enlaces_selectolax(arbol, selector):
+    enlaces = []
+    for nodo in arbol.css(selector):
+        anclas = [nodo] if nodo.tag == "a" else nodo.css("a")
+        for a in anclas:
+            enlaces.append((a.text().strip(), a.attributes.get("href")))
+    return enlaces
+
+def _enlaces_bs4(soup, selector):
+    enlaces = []
+    for nodo in soup.select(selector):
+        anclas = [nodo] if nodo.name == "a" else nodo.find_all("a")
+        for a in anclas:
+            enlaces.append((a.text.strip(), a.get("href")))
+    return enlaces
+
+def _evaluar(html, selectores):
+    with metricas.etapa("parseo"):
+        if SelectolaxParser:
+            arbol, enlaces_de = SelectolaxParser(html), _enlaces_selectolax
+        else:
+            arbol, enlaces_de = BeautifulSoup(html, BS4_BACKEND), _enlaces_bs4
+
+    resultados = {}
+    with metricas.etapa("selector"):
+        for selector in selectores:
+            try:
+                resultados[selector] = enlaces_de(arbol, selector)
+            except Exception as e:
+                logger.warning(f"Selector inválido '{selector}': {e}")
+                resultados[selector] = []
+    return resultados
+
+def _cierra_en(html, selector):
+    """True si el contenedor del selector se cierra, con algún enlace, dentro de `html`"""
+    contenedor = contenedor_de_selector(selector)
+    if not contenedor:
+        return False
+    detector = _DetectorCierre(contenedor)
+    detector.feed(html)
+    return detector.cerrado
+
+def extraer_enlaces(html, selectores, solo_cabecera=True):
+    """Parsea el HTML una sola vez y evalúa todos los selectores sobre el mismo árbol.
+
+    Devuelve {selector: [(texto, href), ...]}. Si un elemento seleccionado no es un
+    enlace se toman los enlaces que contiene. Con `solo_cabecera` se parsea sólo hasta
+    el primer </header> cuando el contenedor de cada selector se cierra antes; si no,
+    los temas pueden seguir en el resto de la página y se parsea entera.
+    """
+    if solo_cabecera:
+        fin = _FIN_CABECERA.search(html)
+        if fin:
+            cabecera = html[:fin.end()]
+            if all(_cierra_en(cabecera, selector) for selector in selectores):
+                return _evaluar(cabecera, selectores)
+    return _evaluar(html, selectores)
+
+
+# Compuesto simple de un selector: etiqueta opcional seguida de .clases / #id
+_COMPUESTO = re.compile(r"^([a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)$")
+
+def contenedor_de_selector(selector):
+    """(etiqueta, clases, id) del elemento cuyo cierre marca el final de los temas.
+
+    Es el antecesor más cercano al objetivo que tiene clase o id: 'ul.menu li a' →
+    ul.menu, 'nav .tags li a' → .tags, 'ul.itemsContainer' → ul.itemsContainer. Una
+    etiqueta sin clase ni id (li, span) se repite a lo largo de la lista y no sirve.
+    Devuelve None si no hay ninguno, para listas con comas, combinadores de hermanos
+    o selectores que apuntan al propio enlace ('a.tag'), porque los temas pueden
+    seguir apareciendo en el resto de la página.
+    """
+    if not selector or any(c in selector for c in ",+~"):
+        return None
+    partes = selector.replace(">", " ").split()
+    for compuesto in reversed(partes[:-1] or partes):
+        coincidencia = _COMPUESTO.match(compuesto)
+        if not coincidencia or not coincidencia.group(2):
+            continue
+        etiqueta = (coincidencia.group(1) or "").lower() or None
+        if etiqueta == "a":
+            return None
+        clases = set(re.findall(r"\.([\w-]+)", coincidencia.group(2)))
+        ids = re.findall(r"#([\w-]+)", coincidencia.group(2))
+        return etiqueta, clases, ids[0] if ids else None
+    return None
+
+class _DetectorCierre(HTMLParser):
+    """Parser incremental que detecta el cierre del primer elemento que encaja con el
+    contenedor y contiene algún enlace; los que se cierran vacíos se ignoran"""
+
+    def __init__(self, contenedor):
+        super().__init__(convert_charrefs=False)
+        self.etiqueta, self.clases, self.id = contenedor
+        self.abierto = None
+        self.profundidad = 0
+        self.enlaces = 0
+        self.cerrado = False
+
+    def _encaja(self, tag, attrs):
+        if self.etiqueta and tag != self.etiqueta:
+            return False
+        attrs = dict(attrs)
+        if self.id and attrs.get("id") != self.id:
+            return False
+        return self.clases <= set((attrs.get("class") or "").split())
+
+    def handle_starttag(self, tag, attrs):
+        if self.cerrado:
+            return
+        if self.abierto is None:
+            if self._encaja(tag, attrs):
+                self.abierto = tag
+                self.profundidad = 1
+                self.enlaces = 0
+            return
+        if tag == self.abierto:
+            self.profundidad += 1
+        if tag == "a":
+            self.enlaces += 1
+
+    def handle_endtag(self, tag):
+        if self.abierto is not None and tag == self.abierto and not self.cerrado:
+            self.profundidad -= 1
+            if self.profundidad == 0:
+                if self.enlaces:
+                    self.cerrado = True
+                else:
+                    self.abierto = None
+
+def leer_html(response, selector=None, max_bytes=None, tam_bloque=16384):
+    """Lee una respuesta en streaming y corta en cuanto se cierra el contenedor del selector.
+
+    Devuelve (html, bytes_leidos, cortado), donde cortado es None, 'contenedor' o
+    'max_bytes'. Sin selector utilizable sólo se aplica el límite de max_bytes.
+    Cierra la respuesta al terminar.
+    """
+    contenedor = contenedor_de_selector(selector)
+    detector = _DetectorCierre(contenedor) if contenedor else None
+    decodificador = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    trozos = []
+    leidos = 0
+    cortado = None
+    try:
+        for bloque in response.iter_content(chunk_size=tam_bloque):
+            leidos += len(bloque)
+            texto = decodificador.decode(bloque)
+            trozos.append(texto)
+            if detector:
+                detector.feed(texto)
+                if detector.cerrado:
+                    cortado = "contenedor"
+                    break
+            if max_bytes and leidos >= max_bytes:
+                cortado = "max_bytes"
+                break
+        else:
+            trozos.append(decodificador.decode(b"", final=True))
+    finally:
+        response.close()
+    return "".join(trozos), leidos, cortado
@@ -0,0 +1,43 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "es-ES,es;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+_sesion = None
+_lock_sesion = threading.Lock()
+
+def get_sesion():
+    """Sesión HTTP compartida por todo el escáner, con conexiones keep-alive reutilizables"""
+    global _sesion
+    if _sesion is None:
+        with _lock_sesion:
+            if _sesion is None:
+                sesion = requests.Session()
+                sesion.headers.update(HEADERS)
+                adaptador = HTTPAdapter(
+                    pool_connections=Config.HTTP_POOL_HOSTS,
+                    pool_maxsize=max(Config.SCAN_CONCURRENCIA, 1)
+                )
+                sesion.mount("http://", adaptador)
+                sesion.mount("https://", adaptador)
+                _sesion = sesion
+    return _sesion
+
+def get_condicional(url, etag=None, last_modified=None, timeout=15, stream=False):
+    """GET con If-None-Match / If-Modified-Since cuando hay validadores previos"""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return get_sesion().get(url, headers=headers, timeout=timeout, stream=stream)
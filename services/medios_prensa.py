@@ -0,0 +1,44 @@
+import logging
+
+from models.medio import importar_medios, resumir_importacion
+
+logger = logging.getLogger(__name__)
+
+# Medios propios del grupo que se dan de alta con /api/agregar-medios-prensa
+MEDIOS_PRENSA = [
+    {"nombre": "Diari de Girona", "url": "https://www.diaridegirona.cat/", "tipo": "propio"},
+    {"nombre": "Diario Córdoba", "url": "https://www.diariocordoba.com/", "tipo": "propio"},
+    {"nombre": "Diario de Ibiza", "url": "https://www.diariodeibiza.es/", "tipo": "propio"},
+    {"nombre": "Información", "url": "https://www.informacion.es/", "tipo": "propio"},
+    {"nombre": "Diario de Mallorca", "url": "https://www.diariodemallorca.es/", "tipo": "propio"},
+    {"nombre": "El Día", "url": "https://www.eldia.es/", "tipo": "propio"},
+    {"nombre": "Empordà", "url": "https://www.emporda.info/", "tipo": "propio"},
+    {"nombre": "El Periódico de Aragón", "url": "https://www.elperiodicodearagon.com/", "tipo": "propio"},
+    {"nombre": "El Periódico Extremadura", "url": "https://www.elperiodicoextremadura.com/", "tipo": "propio"},
+    {"nombre": "El Periódico Mediterráneo", "url": "https://www.elperiodicomediterraneo.com/", "tipo": "propio"},
+    {"nombre": "Faro de Vigo", "url": "https://www.farodevigo.es/", "tipo": "propio"},
+    {"nombre": "La Crónica de Badajoz", "url": "https://www.lacronicabadajoz.com/", "tipo": "propio"},
+    {"nombre": "La Nueva España", "url": "https://www.lne.es/", "tipo": "propio"},
+    {"nombre": "La Opinión A Coruña", "url": "https://www.laopinioncoruna.es/", "tipo": "propio"},
+    {"nombre": "La Opinión de Murcia", "url": "https://www.laopiniondemurcia.es/", "tipo": "propio"},
+    {"nombre": "La Opinión de Málaga", "url": "https://www.laopiniondemalaga.es/", "tipo": "propio"},
+    {"nombre": "La Opinión de Zamora", "url": "https://www.laopiniondezamora.es/", "tipo": "propio"},
+    {"nombre": "La Provincia", "url": "https://www.laprovincia.es/", "tipo": "propio"},
+    {"nombre": "Levante-EMV", "url": "https://www.levante-emv.com/", "tipo": "propio"},
+    {"nombre": "Mallorca Zeitung", "url": "https://www.mallorcazeitung.es/", "tipo": "propio"},
+    {"nombre": "Regió7", "url": "https://www.regio7.cat/", "tipo": "propio"},
+    {"nombre": "Superdeporte", "url": "https://www.superdeporte.es/", "tipo": "propio"},
+    {"nombre": "El Correo Gallego", "url": "https://www.elcorreogallego.es/", "tipo": "propio"},
+    {"nombre": "El Correo Web", "url": "https://www.elcorreoweb.es/", "tipo": "propio"},
+    {"nombre": "EPE", "url": "https://www.epe.es/es/", "tipo": "propio", "selector": "ul.ft-org-header-sidenav-body-header-nav"},
+    {"nombre": "El Periódico", "url": "https://www.elperiodico.com/es/", "tipo": "propio", "selector": "ul.ft-org-header-nav__list"},
+    {"nombre": "Sport", "url": "https://www.sport.es/es/", "tipo": "propio", "selector": "ul.itemsContainer"}
+]
+
+def agregar_medios_prensa():
+    resumen = resumir_importacion(importar_medios(MEDIOS_PRENSA))
+    medios_agregados = resumen["insertados"]
+    medios_existentes = resumen["actualizados"]
+
+    logger.info(f"Agregados {medios_agregados} medios nuevos, {medios_existentes} ya existentes")
+    return {"mensaje": f"Proceso completado. Medios agregados: {medios_agregados}, ya existentes: {medios_existentes}"}
@@ -0,0 +1,105 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Etapas medidas en cada medio: conexión (DNS, TCP, TLS y espera hasta las cabeceras),
+# descarga del cuerpo, parseo del HTML, evaluación de selectores y escritura en la BD
+ETAPAS = ("conexion", "descarga", "parseo", "selector", "escritura")
+
+# Contadores acumulados del proceso: {(nombre, (("etiqueta", "valor"), ...)): valor}
+_contadores = {}
+_lock = threading.Lock()
+
+# Medición del medio que está procesando el hilo actual
+_local = threading.local()
+
+def nueva_medicion():
+    return {"etapas": {e: 0.0 for e in ETAPAS}, "estado_http": None, "bytes": 0, "segundos": 0.0}
+
+def incrementar(nombre, valor=1, **etiquetas):
+    clave = (nombre, tuple(sorted(etiquetas.items())))
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+@contextmanager
+def midiendo(medicion):
+    """Asocia `medicion` al hilo actual mientras dura el bloque"""
+    anterior = getattr(_local, "medicion", None)
+    _local.medicion = medicion
+    try:
+        yield medicion
+    finally:
+        _local.medicion = anterior
+
+def _medicion(medicion=None):
+    return medicion if medicion is not None else getattr(_local, "medicion", None)
+
+@contextmanager
+def etapa(nombre, medicion=None):
+    """Suma la duración del bloque a la etapa `nombre` de la medición en curso"""
+    inicio = time.monotonic()
+    try:
+        yield
+    finally:
+        segundos = time.monotonic() - inicio
+        destino = _medicion(medicion)
+        if destino is not None:
+            destino["etapas"][nombre] = destino["etapas"].get(nombre, 0.0) + segundos
+        incrementar("scanner_etapa_segundos_total", segundos, etapa=nombre)
+
+def anotar_respuesta(response):
+    """Estado HTTP y tiempo hasta las cabeceras de la respuesta de una portada"""
+    segundos = response.elapsed.total_seconds()
+    destino = _medicion()
+    if destino is not None:
+        destino["estado_http"] = response.status_code
+        destino["etapas"]["conexion"] += segundos
+    incrementar("scanner_etapa_segundos_total", segundos, etapa="conexion")
+    incrementar("scanner_http_respuestas_total", estado=str(response.status_code))
+
+def anotar_bytes(leidos):
+    destino = _medicion()
+    if destino is not None:
+        destino["bytes"] += leidos
+    incrementar("scanner_bytes_total", leidos)
+
+def resumir_mediciones(mediciones):
+    """Totales de un escaneo a partir de las mediciones de cada medio"""
+    etapas = {e: 0.0 for e in ETAPAS}
+    http = {}
+    total_bytes = 0
+    for medicion in mediciones:
+        for nombre, segundos in medicion["etapas"].items():
+            etapas[nombre] = etapas.get(nombre, 0.0) + segundos
+        estado = str(medicion["estado_http"] or "error")
+        http[estado] = http.get(estado, 0) + 1
+        total_bytes += medicion["bytes"]
+    return {
+        "etapas": {e: round(s, 3) for e, s in etapas.items()},
+        "http": http,
+        "bytes": total_bytes
+    }
+
+def get_contadores():
+    with _lock:
+        return [(nombre, "counter", dict(etiquetas), valor) for (nombre, etiquetas), valor in _contadores.items()]
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def render_prometheus(series):
+    """Formato de texto de Prometheus para una lista de (nombre, tipo, etiquetas, valor)"""
+    lineas = []
+    tipos = {}
+    for nombre, tipo, etiquetas, valor in sorted(series, key=lambda s: s[0]):
+        if valor is None:
+            continue
+        if nombre not in tipos:
+            tipos[nombre] = tipo
+            lineas.append(f"# TYPE {nombre} {tipo}")
+        if etiquetas:
+            texto = ",".join(f'{k}="{_escapar(v)}"' for k, v in sorted(etiquetas.items()))
+            lineas.append(f"{nombre}{{{texto}}} {float(valor)!r}")
+        else:
+            lineas.append(f"{nombre} {float(valor)!r}")
+    return "\n".join(lineas) + "\n"
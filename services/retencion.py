@@ -0,0 +1,60 @@
+import datetime
+import logging
+import time
+
+from config import Config
+from models.historial import borrar_scan_runs_antiguos_lote
+from models.tema import get_tipos_medio, borrar_temas_antiguos_lote
+
+logger = logging.getLogger(__name__)
+
+def dias_retencion(tipo):
+    return Config.RETENCION_DIAS_POR_TIPO.get(tipo, Config.RETENCION_DIAS)
+
+def aplicar_retencion(dias_historico=None, lote=Config.RETENCION_LOTE, pausa=Config.RETENCION_PAUSA):
+    """Borra los temas fuera de la ventana de retención de su tipo de medio, por lotes,
+    y los escaneos de más de RETENCION_ESCANEOS_DIAS con sus observaciones y mediciones.
+
+    Entre lotes se espera `pausa` segundos para no competir con el escaneo ni
+    disparar el autovacuum de golpe. Devuelve filas y bytes liberados por tipo.
+    """
+    resumen = {"tipos": {}, "filas": 0, "bytes": 0, "medios": 0}
+    medios_afectados = set()
+    for tipo in get_tipos_medio():
+        dias = dias_historico or dias_retencion(tipo)
+        fecha_limite = datetime.datetime.now() - datetime.timedelta(days=dias)
+        filas_tipo = bytes_tipo = lotes = 0
+        while True:
+            filas, tam, medios = borrar_temas_antiguos_lote(tipo, fecha_limite, lote)
+            medios_afectados.update(medios)
+            filas_tipo += filas
+            bytes_tipo += tam
+            lotes += 1
+            if filas < lote:
+                break
+            time.sleep(pausa)
+        resumen["tipos"][tipo] = {"dias": dias, "filas": filas_tipo, "bytes": bytes_tipo, "lotes": lotes}
+        resumen["filas"] += filas_tipo
+        resumen["bytes"] += bytes_tipo
+        logger.info(f"Retención {tipo}: eliminados {filas_tipo} temas ({bytes_tipo} bytes) anteriores a {fecha_limite}")
+
+    # version_temas de cada medio afectado ya se subió al borrar su lote: cada worker
+    # expulsa de su caché esos dominios en la siguiente sincronización
+    resumen["medios"] = len(medios_afectados)
+
+    resumen["escaneos"] = _borrar_escaneos_antiguos(lote, pausa)
+    return resumen
+
+def _borrar_escaneos_antiguos(lote, pausa):
+    fecha_limite = datetime.datetime.now() - datetime.timedelta(days=Config.RETENCION_ESCANEOS_DIAS)
+    escaneos_total = observaciones_total = 0
+    while True:
+        escaneos, observaciones = borrar_scan_runs_antiguos_lote(fecha_limite, lote)
+        escaneos_total += escaneos
+        observaciones_total += observaciones
+        if escaneos < lote:
+            break
+        time.sleep(pausa)
+    logger.info(f"Retención de escaneos: eliminados {escaneos_total} escaneos y {observaciones_total} "
+                f"observaciones anteriores a {fecha_limite}")
+    return {"dias": Config.RETENCION_ESCANEOS_DIAS, "escaneos": escaneos_total, "observaciones": observaciones_total}
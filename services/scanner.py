@@ -1,195 +1,427 @@
-import requests
-from bs4 import BeautifulSoup
 import datetime
+import hashlib
 import time
-import pytz
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
-import psycopg2
-import psycopg2.extras
-from apscheduler.schedulers.background import BackgroundScheduler
-
-from models.tema import add_or_update_tema, get_db_connection, resetear_visibilidad_por_medio
-from models.medio import get_all_medios, add_medio
-from models.competidor import get_competidores_por_medio_padre
-
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scanner.log'),
-        logging.StreamHandler()
-    ]
-)
+
+from models import cache
+from models.canonico import canonizar_url, limpiar_nombre
+from models.tema import guardar_temas, tocar_temas_visibles
+from models.medio import (get_medios_escaneo, normalizar_dominio, get_validadores_http, guardar_validadores_http,
+                          get_huellas_temas, guardar_huella_temas, get_medios_pendientes, marcar_medio_escaneado,
+                          recalcular_intervalos)
+from models.escaneo import encolar_escaneo
+from models.historial import APARECE, DESAPARECE, iniciar_scan_run, registrar_observaciones, guardar_estadisticas_scan_run
+from config import Config
+from services import metricas
+from services.http_pool import get_condicional
+from services.retencion import aplicar_retencion
+from services.extraccion import BACKEND, leer_html
+from services.selectores import resolver_enlaces, cargar_selectores, get_selector
+
 logger = logging.getLogger(__name__)
 
-def limpiar_temas_antiguos(dias_historico=7):
+def limpiar_temas_antiguos(dias_historico=None):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        fecha_limite = datetime.datetime.now() - datetime.timedelta(days=dias_historico)
-        cursor.execute("DELETE FROM temas WHERE ultima_vez < %s", (fecha_limite,))
-        conn.commit()
-        logger.info(f"Limpieza de temas: Eliminados {cursor.rowcount} temas anteriores a {fecha_limite}")
-        conn.close()
+        return aplicar_retencion(dias_historico)
     except Exception as e:
         logger.error(f"Error al limpiar temas antiguos: {e}")
+        raise
+
+# Resultado de obtener_temas_de_web cuando la descarga o el parseo fallan: no se
+# escribe nada, para no ocultar temas que la portada sigue mostrando
+FALLO = object()
 
 TEMAS_INVALIDOS = {"es noticia", "últimas noticias", "todas las noticias", "más leídas", "tendencias"}
 
+# Validadores HTTP (ETag, Last-Modified) por medio, persistidos en la tabla medios.
+# Los de una descarga quedan pendientes hasta que el escaneo confirma que los temas
+# guardados corresponden a esa portada; si no, un 304 dejaría ocultos los temas.
+_validadores_http = {}
+_validadores_pendientes = {}
+_lock_validadores = threading.Lock()
+
+def cargar_validadores_http():
+    try:
+        validadores = get_validadores_http()
+    except Exception as e:
+        logger.error(f"No se pudieron cargar los validadores HTTP: {e}")
+        return
+    with _lock_validadores:
+        _validadores_http.clear()
+        _validadores_http.update(validadores)
+        _validadores_pendientes.clear()
+
+def _guardar_validadores(medio_id, etag, last_modified):
+    try:
+        guardar_validadores_http(medio_id, etag, last_modified)
+    except Exception as e:
+        logger.error(f"No se pudieron guardar los validadores HTTP del medio {medio_id}: {e}")
+
+def _recordar_validadores(medio_id, response):
+    with _lock_validadores:
+        _validadores_pendientes[medio_id] = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+def _confirmar_validadores(medio_id):
+    """Guarda los validadores de la última descarga: los temas guardados son los de esa portada"""
+    with _lock_validadores:
+        validadores = _validadores_pendientes.pop(medio_id, None)
+        if validadores is None or _validadores_http.get(medio_id, (None, None)) == validadores:
+            return
+        _validadores_http[medio_id] = validadores
+    _guardar_validadores(medio_id, *validadores)
+
+def _olvidar_validadores(medio_id):
+    """Sin validadores la próxima descarga es completa y vuelve a comparar los temas"""
+    with _lock_validadores:
+        _validadores_pendientes.pop(medio_id, None)
+        if _validadores_http.pop(medio_id, None) is None:
+            return
+    _guardar_validadores(medio_id, None, None)
+
+def _leer_portada(response, url, selector):
+    with metricas.etapa("descarga"):
+        html, leidos, cortado = leer_html(response, selector, max_bytes=Config.SCAN_MAX_BYTES)
+    metricas.anotar_bytes(leidos)
+    logger.info(f"Leídos {leidos} bytes de {url}{' (lectura cortada)' if cortado else ''}")
+    return html, cortado
+
 def obtener_temas_de_web(medio_id, url, tipo_medio, selector_temas=None, timeout=15):
+    """Devuelve la lista de (nombre, url) del medio, None si la portada no ha cambiado (304)
+    o FALLO si no se pudo descargar o procesar"""
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "es-ES,es;q=0.9",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-        }
         logger.info(f"Obteniendo contenido de {url}...")
-        response = requests.get(url, headers=headers, timeout=timeout)
+        with _lock_validadores:
+            etag, last_modified = _validadores_http.get(medio_id, (None, None))
+        response = get_condicional(url, etag, last_modified, timeout=timeout, stream=True)
+        metricas.anotar_respuesta(response)
+        if response.status_code == 304:
+            response.close()
+            logger.info(f"Sin cambios en {url} (304)")
+            return None
+        if not response.ok:
+            response.close()
         response.raise_for_status()
 
-        if not selector_temas:
-            conn = get_db_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute("SELECT selector FROM medios WHERE id = %s", (medio_id,))
-            medio = cursor.fetchone()
-            conn.close()
-            if medio and medio["selector"]:
-                selector_temas = medio["selector"]
-
-        if not selector_temas:
-            if tipo_medio == 'propio':
-                selectors_propios = [
-                    ".ft-org-header-regionales-menu-panel__tagbar a",
-                    ".tags a",
-                    ".tag-list a",
-                    "a.tag"
-                ]
-                for selector in selectors_propios:
-                    elementos = BeautifulSoup(response.text, 'html.parser').select(selector)
-                    if elementos:
-                        selector_temas = selector
-                        break
-            else:
-                selector_temas = "a.tag, a.tema, .tags a, .tag-list a"
+        # Si ya sabemos qué selector usar, se deja de leer al cerrarse su contenedor
+        dominio = normalizar_dominio(url)
+        selector_forzado = selector_temas
+        selector_previsto, sondear = (selector_forzado, False) if selector_forzado else get_selector(dominio)
+        html, cortado = _leer_portada(response, url, None if sondear else selector_previsto)
 
-        logger.info(f"Usando selector: {selector_temas}")
-        soup = BeautifulSoup(response.text, 'html.parser')
-        temas_elementos = soup.select(selector_temas)
+        selector_temas, enlaces = resolver_enlaces(dominio, html, tipo_medio, selector_forzado=selector_forzado,
+                                                   parcial=cortado == "contenedor")
+        if enlaces is None:
+            # El corte dejó fuera los temas: se relee la portada entera antes de contar un fallo
+            logger.info(f"Sin temas en la lectura cortada de {url}, releyendo la página completa")
+            response = get_condicional(url, timeout=timeout, stream=True)
+            metricas.anotar_respuesta(response)
+            if not response.ok:
+                response.close()
+            response.raise_for_status()
+            html, _ = _leer_portada(response, url, None)
+            selector_temas, enlaces = resolver_enlaces(dominio, html, tipo_medio, selector_forzado=selector_forzado)
 
-        logger.info(f"Encontrados {len(temas_elementos)} elementos con el selector")
+        logger.info(f"Usando selector: {selector_temas} ({BACKEND})")
+        logger.info(f"Encontrados {len(enlaces)} elementos con el selector")
         temas = []
         base_url = '/'.join(url.split('/')[:3])
 
-        for elemento in temas_elementos:
-            nombre = elemento.text.strip()
+        for nombre, url_tema in enlaces:
             if not nombre or nombre.lower() in TEMAS_INVALIDOS:
                 continue
-            url_tema = elemento.get('href')
             if not url_tema:
                 continue
             if not url_tema.startswith(('http://', 'https://')):
                 url_tema = f"{base_url}{url_tema if url_tema.startswith('/') else '/' + url_tema}"
+            nombre, url_tema = limpiar_nombre(nombre), canonizar_url(url_tema)
             temas.append((nombre, url_tema))
             logger.info(f"Tema encontrado: {nombre} -> {url_tema}")
 
+        if temas:
+            _recordar_validadores(medio_id, response)
         return temas
 
     except Exception as e:
         logger.error(f"Error al obtener temas de {url}: {str(e)}")
-        return []
+        return FALLO
+
+# Cortesía por host: cada host recibe como mucho una petición cada SCAN_INTERVALO_HOST segundos
+_ultimo_acceso_host = {}
+_locks_host = {}
+_lock_hosts = threading.Lock()
+
+def _esperar_turno_host(url):
+    host = urllib.parse.urlparse(url).hostname or url
+    with _lock_hosts:
+        lock = _locks_host.setdefault(host, threading.Lock())
+    with lock:
+        espera = _ultimo_acceso_host.get(host, 0) + Config.SCAN_INTERVALO_HOST - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        _ultimo_acceso_host[host] = time.monotonic()
+
+def _descargar_temas_medio(medio):
+    _esperar_turno_host(medio['url'])
+    medicion = metricas.nueva_medicion()
+    inicio = time.monotonic()
+    with metricas.midiendo(medicion):
+        temas = obtener_temas_de_web(medio['id'], medio['url'], medio['tipo'])
+    medicion["segundos"] = time.monotonic() - inicio
+    return temas, medicion
+
+def escanear_concurrente(medios, concurrencia):
+    """Descarga los temas de cada medio en un pool de `concurrencia` hilos.
+
+    Devuelve un generador de (medio, temas, medicion) en orden de finalización;
+    medicion lleva la duración total, los tiempos por etapa, el estado HTTP y los bytes.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, concurrencia)) as pool:
+        futuros = {pool.submit(_descargar_temas_medio, medio): medio for medio in medios}
+        for futuro in as_completed(futuros):
+            medio = futuros[futuro]
+            try:
+                temas, medicion = futuro.result()
+            except Exception as e:
+                logger.error(f"Error al escanear {medio['url']}: {e}")
+                temas, medicion = FALLO, metricas.nueva_medicion()
+            yield medio, temas, medicion
+
+# Huella de la última lista de temas guardada por medio
+_huellas_temas = {}
+
+def cargar_huellas_temas():
+    try:
+        huellas = get_huellas_temas()
+    except Exception as e:
+        logger.error(f"No se pudieron cargar las huellas de temas: {e}")
+        return
+    _huellas_temas.clear()
+    _huellas_temas.update(huellas)
+
+def huella_temas(temas):
+    """Huella estable de una lista de (nombre, url), independiente del orden"""
+    contenido = "\n".join(f"{nombre}\t{url}" for nombre, url in sorted(set(temas)))
+    return hashlib.sha1(contenido.encode("utf-8")).hexdigest()
+
+def guardar_temas_medio(medio_id, temas, eventos=None):
+    """Persiste el resultado del escaneo de un medio.
 
-def escanear_medios_por_lotes(lote_size=5):
+    Devuelve None si la descarga falló (no se escribe nada), si la portada respondió
+    304 o si la huella coincide con la anterior (una sola sentencia que refresca
+    ultima_vez), o los contadores de guardar_temas. Los validadores HTTP de la
+    descarga sólo se guardan cuando la huella coincide.
+    Si se pasa `eventos`, añade las apariciones y desapariciones para el registro
+    de observaciones del escaneo.
+    """
+    if temas is FALLO:
+        _olvidar_validadores(medio_id)
+        return None
+    if temas is None:
+        tocar_temas_visibles(medio_id)
+        return None
+
+    huella = huella_temas(temas) if temas else None
+    if huella and _huellas_temas.get(medio_id) == huella:
+        tocar_temas_visibles(medio_id)
+        _confirmar_validadores(medio_id)
+        return None
+
+    # La lista cambia o queda vacía: hasta que otra descarga completa la confirme,
+    # la portada no puede responder 304 sobre estos temas
+    _olvidar_validadores(medio_id)
+    _huellas_temas.pop(medio_id, None)
+    contadores = guardar_temas(medio_id, temas)
+    cache.invalidar_medio(medio_id)
+    if eventos is not None:
+        momento = contadores["momento"]
+        eventos.extend((medio_id, tema_id, APARECE, momento) for tema_id in contadores["aparecidos"])
+        eventos.extend((medio_id, tema_id, DESAPARECE, momento) for tema_id in contadores["desaparecidos"])
+
+    # Una lista vacía borra la huella: la siguiente con temas se vuelve a escribir entera
+    guardar_huella_temas(medio_id, huella)
+    if huella:
+        _huellas_temas[medio_id] = huella
+    return contadores
+
+def cargar_estado_escaneo():
+    cargar_validadores_http()
+    cargar_huellas_temas()
+    cargar_selectores()
+
+def _marcar_escaneado(medio):
+    try:
+        marcar_medio_escaneado(medio['id'], Config.SCAN_INTERVALO_DEFECTO_MINUTOS)
+    except Exception as e:
+        logger.error(f"No se pudo planificar el próximo escaneo de {medio['nombre']}: {e}")
+
+def _medicion_medio(medio, temas, medicion):
+    return {
+        "medio_id": medio['id'],
+        "nombre": medio['nombre'],
+        "segundos": round(medicion["segundos"], 3),
+        "temas": None if temas is None else 0 if temas is FALLO else len(temas),
+        "estado_http": medicion["estado_http"],
+        "bytes": medicion["bytes"],
+        "etapas": {e: round(seg, 4) for e, seg in medicion["etapas"].items()}
+    }
+
+def _cerrar_scan_run(scan_id, eventos, mediciones, duracion):
+    """Guarda las observaciones y las estadísticas del escaneo; devuelve el resumen de métricas"""
+    resumen = metricas.resumir_mediciones(mediciones)
+    resumen.update({
+        "duracion_segundos": round(duracion, 3),
+        "medios": len(mediciones),
+        "medios_sin_temas": sum(1 for m in mediciones if m["temas"] == 0)
+    })
+    try:
+        registrar_observaciones(scan_id, eventos)
+    except Exception as e:
+        logger.error(f"No se pudieron registrar las observaciones del escaneo {scan_id}: {e}")
+    try:
+        guardar_estadisticas_scan_run(scan_id, resumen, mediciones)
+    except Exception as e:
+        logger.error(f"No se pudieron guardar las estadísticas del escaneo {scan_id}: {e}")
+    return resumen
+
+def _clave_url(url):
+    return normalizar_dominio(url) + urllib.parse.urlsplit(url.strip()).path.rstrip("/")
+
+def medios_a_visitar(medios):
+    """Filtra los medios de un escaneo para descargar cada portada una sola vez.
+
+    Quita los repetidos (mismo id o misma URL sin esquema, www. ni barra final) y los
+    marcados como `reciente`, cuyo último resultado sigue guardado y sirve a todos.
+    Devuelve (a_visitar, recientes, repetidos).
+    """
+    vistos = set()
+    visitar = []
+    recientes = repetidos = 0
+    for medio in medios:
+        claves = {("id", medio['id']), ("url", _clave_url(medio['url']))}
+        if claves & vistos:
+            repetidos += 1
+            continue
+        vistos |= claves
+        if medio.get('reciente'):
+            recientes += 1
+            continue
+        visitar.append(medio)
+    return visitar, recientes, repetidos
+
+def escanear_medios_por_lotes(lote_size=Config.SCAN_CONCURRENCIA, medios=None, tipo='medios'):
+    """Escanea `medios` (por defecto todos); `lote_size` es el número de descargas simultáneas.
+
+    Cada portada se descarga como mucho una vez por escaneo y se omiten los medios
+    escaneados en los últimos SCAN_FRESCURA_MINUTOS por cualquier otro escaneo.
+    """
     logger.info(f"Iniciando escaneo a las {datetime.datetime.now()}")
-    medios = get_all_medios()
+    scan_id = iniciar_scan_run(tipo)
+    eventos = []
+    inicio = time.monotonic()
+    if medios is None:
+        medios = get_medios_escaneo(frescura_minutos=Config.SCAN_FRESCURA_MINUTOS)
+    medios, medios_recientes, medios_repetidos = medios_a_visitar(medios)
+    if medios_recientes or medios_repetidos:
+        logger.info(f"Omitidos {medios_recientes} medios escaneados recientemente y {medios_repetidos} repetidos")
+    cargar_estado_escaneo()
     total_medios = len(medios)
     medios_procesados = 0
     temas_encontrados = 0
+    medios_sin_cambios = 0
+    medios_con_error = 0
+    totales = {"insertados": 0, "refrescados": 0, "ocultados": 0}
+    latencias = []
 
-    for i in range(0, total_medios, lote_size):
-        lote_actual = medios[i:i+lote_size]
-        for medio in lote_actual:
-            print(f"[{medios_procesados+1}/{total_medios}] Escaneando medio: {medio['nombre']} ({medio['url']}) - Tipo: {medio['tipo']}")
-            resetear_visibilidad_por_medio(medio['id'])
-            temas = obtener_temas_de_web(medio['id'], medio['url'], medio['tipo'])
+    for medio, temas, medicion in escanear_concurrente(medios, lote_size):
+        medios_procesados += 1
+        print(f"[{medios_procesados}/{total_medios}] Escaneado medio: {medio['nombre']} ({medio['url']}) - Tipo: {medio['tipo']} - {medicion['segundos']:.2f}s")
+        _marcar_escaneado(medio)
+        try:
+            with metricas.etapa("escritura", medicion):
+                contadores = guardar_temas_medio(medio['id'], temas, eventos)
+        except Exception as e:
+            logger.error(f"Error al guardar temas de {medio['nombre']}: {e}")
+            continue
+        finally:
+            latencias.append(_medicion_medio(medio, temas, medicion))
+        if temas is FALLO:
+            medios_con_error += 1
+            print(f"✗ Error al escanear {medio['nombre']}, se conservan sus temas")
+        elif contadores is None:
+            medios_sin_cambios += 1
+            print(f"= Sin cambios en {medio['nombre']}")
+        else:
+            for clave in totales:
+                totales[clave] += contadores[clave]
             if temas:
-                for nombre, url in temas:
-                    add_or_update_tema(medio['id'], nombre, url)
                 temas_encontrados += len(temas)
                 print(f"✓ Encontrados {len(temas)} temas en {medio['nombre']}")
             else:
                 print(f"✗ No se encontraron temas en {medio['nombre']}")
-            medios_procesados += 1
-            time.sleep(1.5)
-        time.sleep(2)
-
-    logger.info(f"Escaneo completado. Medios: {medios_procesados}, Temas: {temas_encontrados}")
-    return {"medios_procesados": medios_procesados, "temas_encontrados": temas_encontrados}
-
-def escanear_competidores_por_lotes():
-    propios = [m for m in get_all_medios() if m['tipo'] == 'propio']
-    total = 0
-    for medio in propios:
-        competidores = get_competidores_por_medio_padre(medio['id'])
-        for c in competidores:
-            resetear_visibilidad_por_medio(c['id'])
-            temas = obtener_temas_de_web(c['id'], c['url'], c['tipo'])
-            for nombre, url in temas:
-                add_or_update_tema(c['id'], nombre, url)
-                total += 1
-    logger.info(f"Escaneo de competidores completado. Temas encontrados: {total}")
-    return {"temas_encontrados": total}
-
-def agregar_medios_prensa():
-    medios_propios = [
-        {"nombre": "Diari de Girona", "url": "https://www.diaridegirona.cat/", "tipo": "propio"},
-        {"nombre": "Diario Córdoba", "url": "https://www.diariocordoba.com/", "tipo": "propio"},
-        {"nombre": "Diario de Ibiza", "url": "https://www.diariodeibiza.es/", "tipo": "propio"},
-        {"nombre": "Información", "url": "https://www.informacion.es/", "tipo": "propio"},
-        {"nombre": "Diario de Mallorca", "url": "https://www.diariodemallorca.es/", "tipo": "propio"},
-        {"nombre": "El Día", "url": "https://www.eldia.es/", "tipo": "propio"},
-        {"nombre": "Empordà", "url": "https://www.emporda.info/", "tipo": "propio"},
-        {"nombre": "El Periódico de Aragón", "url": "https://www.elperiodicodearagon.com/", "tipo": "propio"},
-        {"nombre": "El Periódico Extremadura", "url": "https://www.elperiodicoextremadura.com/", "tipo": "propio"},
-        {"nombre": "El Periódico Mediterráneo", "url": "https://www.elperiodicomediterraneo.com/", "tipo": "propio"},
-        {"nombre": "Faro de Vigo", "url": "https://www.farodevigo.es/", "tipo": "propio"},
-        {"nombre": "La Crónica de Badajoz", "url": "https://www.lacronicabadajoz.com/", "tipo": "propio"},
-        {"nombre": "La Nueva España", "url": "https://www.lne.es/", "tipo": "propio"},
-        {"nombre": "La Opinión A Coruña", "url": "https://www.laopinioncoruna.es/", "tipo": "propio"},
-        {"nombre": "La Opinión de Murcia", "url": "https://www.laopiniondemurcia.es/", "tipo": "propio"},
-        {"nombre": "La Opinión de Málaga", "url": "https://www.laopiniondemalaga.es/", "tipo": "propio"},
-        {"nombre": "La Opinión de Zamora", "url": "https://www.laopiniondezamora.es/", "tipo": "propio"},
-        {"nombre": "La Provincia", "url": "https://www.laprovincia.es/", "tipo": "propio"},
-        {"nombre": "Levante-EMV", "url": "https://www.levante-emv.com/", "tipo": "propio"},
-        {"nombre": "Mallorca Zeitung", "url": "https://www.mallorcazeitung.es/", "tipo": "propio"},
-        {"nombre": "Regió7", "url": "https://www.regio7.cat/", "tipo": "propio"},
-        {"nombre": "Superdeporte", "url": "https://www.superdeporte.es/", "tipo": "propio"},
-        {"nombre": "El Correo Gallego", "url": "https://www.elcorreogallego.es/", "tipo": "propio"},
-        {"nombre": "El Correo Web", "url": "https://www.elcorreoweb.es/", "tipo": "propio"},
-        {"nombre": "EPE", "url": "https://www.epe.es/es/", "tipo": "propio", "selector": "ul.ft-org-header-sidenav-body-header-nav"},
-        {"nombre": "El Periódico", "url": "https://www.elperiodico.com/es/", "tipo": "propio", "selector": "ul.ft-org-header-nav__list"},
-        {"nombre": "Sport", "url": "https://www.sport.es/es/", "tipo": "propio", "selector": "ul.itemsContainer"}
-    ]
-
-    medios_agregados = 0
-    medios_existentes = 0
-
-    for medio in medios_propios:
-        resultado, status_code = add_medio(medio["nombre"], medio["url"], medio["tipo"], medio.get("selector"))
-        if status_code == 201:
-            medios_agregados += 1
-        else:
-            medios_existentes += 1
 
-    logger.info(f"Agregados {medios_agregados} medios nuevos, {medios_existentes} ya existentes")
-    return {"mensaje": f"Proceso completado. Medios agregados: {medios_agregados}, ya existentes: {medios_existentes}"}
+    duracion = time.monotonic() - inicio
+    resumen = _cerrar_scan_run(scan_id, eventos, latencias, duracion)
+    logger.info(f"Escaneo completado en {duracion:.1f}s. Medios: {medios_procesados}, Temas: {temas_encontrados}")
+    return {
+        "scan_id": scan_id,
+        "medios_procesados": medios_procesados,
+        "temas_encontrados": temas_encontrados,
+        "medios_sin_cambios": medios_sin_cambios,
+        "medios_con_error": medios_con_error,
+        "medios_recientes": medios_recientes,
+        "medios_repetidos": medios_repetidos,
+        **totales,
+        "duracion_segundos": round(duracion, 3),
+        "etapas": resumen["etapas"],
+        "http": resumen["http"],
+        "bytes": resumen["bytes"],
+        "latencias": sorted(latencias, key=lambda l: l["segundos"], reverse=True)
+    }
+
+def escanear_competidores_por_lotes(concurrencia=Config.SCAN_CONCURRENCIA):
+    """Escanea cada competidor una sola vez aunque compita con varios medios propios"""
+    competidores = get_medios_escaneo(solo_competidores=True, frescura_minutos=Config.SCAN_FRESCURA_MINUTOS)
+    return escanear_medios_por_lotes(concurrencia, medios=competidores, tipo='competidores')
+
+def escanear_medios_pendientes(lote_size=Config.SCAN_CONCURRENCIA):
+    """Escanea sólo los medios cuyo próximo escaneo planificado ya ha llegado"""
+    return escanear_medios_por_lotes(lote_size, medios=get_medios_pendientes(), tipo='pendientes')
+
+def planificar_escaneos():
+    """Encola un escaneo de pendientes si algún medio ha cumplido su intervalo"""
+    if get_medios_pendientes():
+        encolar_escaneo('pendientes')
+
+def recalcular_planificacion():
+    intervalos = recalcular_intervalos(
+        Config.SCAN_VENTANA_CAMBIOS_HORAS,
+        Config.SCAN_INTERVALO_MIN_MINUTOS,
+        Config.SCAN_INTERVALO_MAX_MINUTOS,
+        Config.SCAN_CAMBIOS_POR_ESCANEO
+    )
+    logger.info(f"Intervalos de escaneo recalculados para {len(intervalos)} medios")
+    return intervalos
+
+# Tareas que worker.py sabe ejecutar, por tipo de escaneo encolado
+TAREAS = {
+    'medios': escanear_medios_por_lotes,
+    'pendientes': escanear_medios_pendientes,
+    'competidores': escanear_competidores_por_lotes,
+    'limpieza': limpiar_temas_antiguos,
+}
 
 def init_scheduler():
+    """Programador del worker de escaneo: sólo encola, worker.py ejecuta la cola"""
+    import pytz
+    from apscheduler.schedulers.background import BackgroundScheduler
+
     scheduler = BackgroundScheduler(timezone=pytz.UTC)
-    scheduler.add_job(escanear_medios_por_lotes, 'interval', hours=1, id='escaneo_medios')
-    scheduler.add_job(limpiar_temas_antiguos, 'interval', days=7, id='limpiar_temas')
+    scheduler.add_job(planificar_escaneos, 'interval', minutes=1, id='planificar_escaneos')
+    scheduler.add_job(recalcular_planificacion, 'interval', hours=1, id='recalcular_intervalos',
+                      next_run_time=datetime.datetime.now(pytz.UTC))
+    scheduler.add_job(encolar_escaneo, 'interval', days=7, args=['limpieza'], id='limpiar_temas')
     logger.info("Scheduler inicializado correctamente")
     return scheduler
@@ -0,0 +1,106 @@
+import logging
+import threading
+
+from config import Config
+from models.medio import get_estado_selectores, registrar_resultado_selector
+from services.extraccion import extraer_enlaces
+
+logger = logging.getLogger(__name__)
+
+# Selectores conocidos de antemano; se usan mientras el dominio no tenga uno guardado
+SELECTORES_POR_DOMINIO = {
+    "sport.es": ".news",
+    "epe.es": ".ft-org-header-sidenav-body-header-nav",
+    "elperiodico.com": ".ft-org-header-nav__list",
+}
+
+# Candidatos que se prueban cuando no hay selector o el guardado ha dejado de funcionar
+SELECTORES_PROPIOS = [
+    ".ft-org-header-regionales-menu-panel__tagbar a",
+    ".tags a",
+    ".tag-list a",
+    "a.tag"
+]
+SELECTOR_COMPETENCIA = "a.tag, a.tema, .tags a, .tag-list a"
+
+# Estado por dominio: selector, aciertos, intentos, fallos_consecutivos
+_estado = {}
+_lock = threading.Lock()
+
+def cargar_selectores():
+    try:
+        estado = get_estado_selectores()
+    except Exception as e:
+        logger.error(f"No se pudieron cargar los selectores: {e}")
+        return
+    with _lock:
+        _estado.clear()
+        _estado.update(estado)
+
+def _selector_semilla(dominio):
+    for clave, selector in SELECTORES_POR_DOMINIO.items():
+        if clave in dominio:
+            return selector
+    return None
+
+def get_selector(dominio):
+    """Selector en uso para el dominio (guardado o semilla) y si toca volver a sondear"""
+    with _lock:
+        estado = _estado.get(dominio)
+    if estado and estado["selector"]:
+        return estado["selector"], estado["fallos_consecutivos"] >= Config.SELECTOR_FALLOS_MAX
+    return _selector_semilla(dominio), False
+
+def _registrar(dominio, selector, acierto):
+    with _lock:
+        estado = _estado.setdefault(dominio, {
+            "selector": None, "aciertos": 0, "intentos": 0, "fallos_consecutivos": 0
+        })
+        if selector != estado["selector"]:
+            estado.update(selector=selector, fallos_consecutivos=0)
+        estado["intentos"] += 1
+        if acierto:
+            estado["aciertos"] += 1
+            estado["fallos_consecutivos"] = 0
+        else:
+            estado["fallos_consecutivos"] += 1
+    try:
+        registrar_resultado_selector(dominio, selector, acierto)
+    except Exception as e:
+        logger.error(f"No se pudo guardar el selector de {dominio}: {e}")
+
+def resolver_enlaces(dominio, html, tipo_medio, selector_forzado=None, parcial=False):
+    """Devuelve (selector, [(texto, href), ...]) para la página de un dominio.
+
+    Usa el selector guardado para el dominio y sólo sondea los candidatos cuando no
+    hay ninguno o cuando el guardado lleva SELECTOR_FALLOS_MAX escaneos sin resultados.
+    El selector ganador se guarda en memoria y en medios.selector.
+
+    Con `parcial` (HTML cortado al cerrarse el contenedor) un resultado vacío no cuenta
+    como fallo: devuelve (selector, None) y el llamador debe releer la página completa.
+    """
+    if selector_forzado:
+        enlaces = extraer_enlaces(html, [selector_forzado])[selector_forzado]
+        return selector_forzado, None if parcial and not enlaces else enlaces
+
+    selector, sondear = get_selector(dominio)
+    if selector and not sondear:
+        enlaces = extraer_enlaces(html, [selector])[selector]
+        if parcial and not enlaces:
+            return selector, None
+        _registrar(dominio, selector, bool(enlaces))
+        return selector, enlaces
+
+    candidatos = SELECTORES_PROPIOS if tipo_medio == 'propio' else [SELECTOR_COMPETENCIA]
+    if selector:
+        candidatos = [selector] + [c for c in candidatos if c != selector]
+    enlaces_por_selector = extraer_enlaces(html, candidatos)
+    ganador = next((c for c in candidatos if enlaces_por_selector[c]), None)
+    if ganador:
+        if ganador != selector:
+            logger.info(f"Nuevo selector aprendido para {dominio}: {ganador}")
+        _registrar(dominio, ganador, True)
+        return ganador, enlaces_por_selector[ganador]
+
+    _registrar(dominio, selector, False)
+    return selector or candidatos[-1], []
@@ -14,8 +14,7 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(response => response.json())
             .then(data => {
-                alert('Escaneo completado: ' + data.mensaje);
-                location.reload();
+                alert(data.mensaje + ' (escaneo #' + data.escaneo_id + ')');
             })
             .catch(error => {
                 alert('Error durante el escaneo: ' + error);
@@ -27,8 +26,117 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // Auto-refresh
+    // Cambios en vivo: el servidor envía sólo los temas que aparecen o desaparecen
+    const tablaTemas = document.getElementById('tablaTemas');
+    if (tablaTemas && window.EventSource) {
+        const eventos = new EventSource(tablaTemas.dataset.eventos);
+        eventos.addEventListener('temas', function(e) {
+            aplicarCambios(tablaTemas, JSON.parse(e.data));
+        });
+        // Los cortes de red se reintentan solos; si el servidor rechaza el canal
+        // (503 sin hueco para más flujos) se vuelve a la recarga periódica
+        eventos.onerror = function() {
+            if (eventos.readyState === EventSource.CLOSED) {
+                recargarMasTarde();
+            }
+        };
+    } else if (tablaTemas) {
+        recargarMasTarde();
+    }
+});
+
+function recargarMasTarde() {
     setTimeout(() => {
         window.location.reload();
     }, 5 * 60 * 1000); // Recargar cada 5 minutos
-});
\ No newline at end of file
+}
+
+function celda(texto) {
+    const td = document.createElement('td');
+    td.textContent = texto;
+    return td;
+}
+
+function formatearFecha(iso) {
+    const fecha = new Date(iso);
+    const dos = n => String(n).padStart(2, '0');
+    return `${dos(fecha.getDate())}/${dos(fecha.getMonth() + 1)} ${dos(fecha.getHours())}:${dos(fecha.getMinutes())}`;
+}
+
+function filaTema(tema, cambio) {
+    const tr = document.createElement('tr');
+    tr.dataset.temaId = tema.id;
+    tr.appendChild(celda(tema.nombre));
+    tr.appendChild(celda(cambio.medio));
+    tr.appendChild(celda(cambio.tipo));
+    tr.appendChild(celda(formatearFecha(tema.primera_vez)));
+    tr.appendChild(celda(formatearFecha(tema.ultima_vez)));
+
+    const duracion = document.createElement('td');
+    const badge = document.createElement('span');
+    badge.className = 'badge-verde';
+    badge.textContent = '0h';
+    duracion.appendChild(badge);
+    tr.appendChild(duracion);
+
+    const visible = document.createElement('td');
+    visible.className = 'visible';
+    visible.innerHTML = '<span style="color:green">Sí</span>';
+    tr.appendChild(visible);
+
+    const enlace = document.createElement('td');
+    const a = document.createElement('a');
+    a.href = tema.url;
+    a.target = '_blank';
+    a.className = 'btn btn-sm btn-primary';
+    a.textContent = 'Ver noticia';
+    enlace.appendChild(a);
+    tr.appendChild(enlace);
+    return tr;
+}
+
+function aplicarCambios(tabla, cambio) {
+    if (cambio.recargar) {
+        window.location.reload();
+        return;
+    }
+    const filtroVisible = tabla.dataset.visible;
+    const total = document.getElementById('totalTemas');
+    let diferencia = 0;
+
+    cambio.aparecidos.forEach(tema => {
+        const fila = tabla.querySelector(`tr[data-tema-id="${tema.id}"]`);
+        if (fila) {
+            // Un tema que vuelve a portada ya tiene fila: se marca visible otra vez
+            if (filtroVisible === 'false') {
+                fila.remove();
+                diferencia -= 1;
+            } else {
+                fila.querySelector('td.visible').innerHTML = '<span style="color:green">Sí</span>';
+            }
+        } else if (tabla.dataset.pagina === '1' && filtroVisible !== 'false') {
+            // Los temas nuevos sólo se insertan en la primera página, que es la de los más recientes
+            tabla.insertBefore(filaTema(tema, cambio), tabla.firstChild);
+            diferencia += 1;
+        }
+    });
+
+    cambio.desaparecidos.forEach(tema => {
+        const fila = tabla.querySelector(`tr[data-tema-id="${tema.id}"]`);
+        if (!fila) return;
+        if (filtroVisible === 'true') {
+            fila.remove();
+            diferencia -= 1;
+        } else {
+            fila.querySelector('td.visible').innerHTML = '<span style="color:red">No</span>';
+        }
+    });
+
+    if (total && diferencia) {
+        total.textContent = parseInt(total.textContent, 10) + diferencia;
+    }
+    const actualizacion = document.getElementById('ultimaActualizacion');
+    if (actualizacion) {
+        actualizacion.textContent = new Date().toLocaleString();
+    }
+}
\ No newline at end of file
@@ -0,0 +1,72 @@
+import pytest
+
+from models.canonico import canonizar_tema, canonizar_url, normalizar_nombre
+
+SEGUIMIENTO = ["utm_*", "fbclid", "gclid"]
+
+@pytest.mark.parametrize("url, esperada", [
+    ("https://www.epe.es/tema?utm_source=x&utm_medium=y", "https://www.epe.es/tema"),
+    ("https://www.epe.es/tema?id=3&fbclid=abc&UTM_Campaign=z", "https://www.epe.es/tema?id=3"),
+    ("https://www.epe.es/tema?gclid=1&id=3&pag=2", "https://www.epe.es/tema?id=3&pag=2"),
+    ("https://www.epe.es/tema?utm_source%3D=x&id=3", "https://www.epe.es/tema?id=3"),
+    ("https://www.epe.es/tema?utmsource=x", "https://www.epe.es/tema?utmsource=x"),
+])
+def test_quita_parametros_de_seguimiento(url, esperada):
+    assert canonizar_url(url, SEGUIMIENTO) == esperada
+
+@pytest.mark.parametrize("url, esperada", [
+    ("http://www.epe.es/tema", "https://www.epe.es/tema"),
+    ("http://www.epe.es:80/tema", "https://www.epe.es/tema"),
+    ("https://www.epe.es:443/tema", "https://www.epe.es/tema"),
+    ("http://www.epe.es:8080/tema", "http://www.epe.es:8080/tema"),
+    ("https://www.epe.es:8443/tema", "https://www.epe.es:8443/tema"),
+    ("HTTP://www.epe.es:8080/tema", "http://www.epe.es:8080/tema"),
+])
+def test_puertos_por_defecto_y_propios(url, esperada):
+    assert canonizar_url(url, SEGUIMIENTO) == esperada
+
+@pytest.mark.parametrize("url, esperada", [
+    ("https://www.epe.es/es/tema/", "https://www.epe.es/es/tema"),
+    ("https://www.epe.es/es/tema///", "https://www.epe.es/es/tema"),
+    ("https://www.epe.es/", "https://www.epe.es"),
+    ("https://www.epe.es/es/tema/?id=3", "https://www.epe.es/es/tema?id=3"),
+])
+def test_quita_la_barra_final(url, esperada):
+    assert canonizar_url(url, SEGUIMIENTO) == esperada
+
+def test_host_en_minusculas_y_ruta_intacta():
+    assert canonizar_url("https://WWW.Epe.ES/Es/Tema", SEGUIMIENTO) == "https://www.epe.es/Es/Tema"
+
+@pytest.mark.parametrize("url", [
+    "https://www.epe.es/tema#top",
+    "https://www.epe.es/tema/#comentarios",
+    "https://www.epe.es/tema?utm_source=x#top",
+])
+def test_quita_el_fragmento(url):
+    assert canonizar_url(url, SEGUIMIENTO) == "https://www.epe.es/tema"
+
+def test_ejemplo_completo():
+    url = "HTTP://WWW.Epe.es:80/es/tema/?utm_source=x&id=3#top"
+    assert canonizar_url(url, SEGUIMIENTO) == "https://www.epe.es/es/tema?id=3"
+
+@pytest.mark.parametrize("url", ["", None, "mailto:redaccion@epe.es", "/es/tema", "javascript:void(0)"])
+def test_deja_lo_que_no_es_una_url_web(url):
+    assert canonizar_url(url, SEGUIMIENTO) == url
+
+@pytest.mark.parametrize("nombre, clave", [
+    ("Crisis  en Valéncia", "crisis en valencia"),
+    ("ELECCIONES GENERALES", "elecciones generales"),
+    ("Pingüino ÁÉÍÓÚ", "pinguino aeiou"),
+    ("  Año\tnuevo\n", "ano nuevo"),
+    ("Straße", "strasse"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalizar_nombre_pliega_tildes_y_mayusculas(nombre, clave):
+    assert normalizar_nombre(nombre) == clave
+
+def test_misma_identidad_con_variantes_de_nombre_y_url():
+    a = canonizar_tema("Crisis en Valéncia", "http://www.epe.es/crisis/?utm_source=x")
+    b = canonizar_tema("crisis  en valencia", "https://WWW.epe.es/crisis#top")
+    assert a[1:] == b[1:]
+    assert a[0] == "Crisis en Valéncia"
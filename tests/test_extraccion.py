@@ -0,0 +1,70 @@
+import pytest
+
+from services.extraccion import contenedor_de_selector, extraer_enlaces, leer_html
+
+class RespuestaFalsa:
+    """Respuesta en streaming que entrega el HTML en bloques pequeños"""
+
+    def __init__(self, html, tam_bloque=64):
+        self.encoding = "utf-8"
+        self._datos = html.encode("utf-8")
+        self._tam = tam_bloque
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self._datos), self._tam):
+            yield self._datos[i:i + self._tam]
+
+    def close(self):
+        pass
+
+def _enlaces(n, desde=0):
+    return "".join(f'<a href="/tema/{i}">Tema {i}</a>' for i in range(desde, desde + n))
+
+def test_cabecera_basta_si_el_contenedor_se_cierra_en_ella():
+    html = f'<header><ul class="tags"><li>{_enlaces(3)}</li></ul></header><main>{_enlaces(50, 100)}</main>'
+    assert len(extraer_enlaces(html, [".tags a"])[".tags a"]) == 3
+
+def test_lista_de_selectores_con_coincidencia_en_la_cabecera_parsea_la_pagina():
+    selector = "a.tag, a.tema, .tags a, .tag-list a"
+    html = f'<header><a class="tag" href="/0">Tema 0</a></header><main><div class="tags">{_enlaces(10, 1)}</div></main>'
+    assert len(extraer_enlaces(html, [selector])[selector]) == 11
+
+def test_sondeo_evalua_todos_los_candidatos_sobre_la_pagina_entera():
+    html = f'<header><div class="tags">{_enlaces(1)}</div></header><main><nav class="temas">{_enlaces(8, 1)}</nav></main>'
+    resultados = extraer_enlaces(html, [".tags a", "nav.temas a"])
+    assert len(resultados[".tags a"]) == 1
+    assert len(resultados["nav.temas a"]) == 8
+
+@pytest.mark.parametrize("selector, contenedor", [
+    ("ul.itemsContainer", ("ul", {"itemsContainer"}, None)),
+    (".tags a", (None, {"tags"}, None)),
+    ("div.main > ul.x a", ("ul", {"x"}, None)),
+    ("ul.menu li a", ("ul", {"menu"}, None)),
+    ("nav .tags li a", (None, {"tags"}, None)),
+    ("#temas > li > a", (None, set(), "temas")),
+    ("div.portada ul li span a", ("div", {"portada"}, None)),
+    ("ul li a", None),
+    ("nav ul", None),
+    ("a.tag", None),
+    ("a.tag, .tags a", None),
+    ("h2 + ul.temas a", None),
+])
+def test_contenedor_de_selector(selector, contenedor):
+    assert contenedor_de_selector(selector) == contenedor
+
+@pytest.mark.parametrize("selector", ["ul.menu li a", "nav .tags li a", "ul li a"])
+def test_lectura_cortada_conserva_todos_los_temas(selector):
+    lista = "".join(f'<li><a href="/tema/{i}">Tema {i}</a></li>' for i in range(10))
+    html = (f'<html><body><nav class="principal"><div class="tags"><ul class="menu">{lista}</ul></div></nav>'
+            f'<main>{"<p>relleno</p>" * 500}</main></body></html>')
+    leido, _, cortado = leer_html(RespuestaFalsa(html), selector)
+    assert len(extraer_enlaces(leido, [selector])[selector]) == 10
+    if contenedor_de_selector(selector):
+        assert cortado == "contenedor"
+        assert len(leido) < len(html)
+
+def test_contenedor_vacio_no_corta_la_lectura():
+    html = '<div class="tags"></div><p>intermedio</p><div class="tags"><a href="/1">Uno</a></div><footer>pie</footer>'
+    leido, _, cortado = leer_html(RespuestaFalsa(html, 8), ".tags a")
+    assert cortado == "contenedor"
+    assert extraer_enlaces(leido, [".tags a"])[".tags a"] == [("Uno", "/1")]
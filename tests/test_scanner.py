@@ -0,0 +1,142 @@
+import datetime
+
+import pytest
+
+from services import scanner
+
+TEMAS = [("Política", "https://medio.es/politica"), ("Fútbol", "https://medio.es/futbol")]
+
+class RespuestaFalsa:
+    def __init__(self, status_code=200, html="", cabeceras=None):
+        self.status_code = status_code
+        self.headers = cabeceras or {}
+        self.encoding = "utf-8"
+        self.elapsed = datetime.timedelta(milliseconds=5)
+        self._html = html.encode("utf-8")
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size=1):
+        yield self._html
+
+    def close(self):
+        pass
+
+class Portada:
+    """get_condicional falso: sirve `temas` con un ETag y responde 304 si se le envía"""
+
+    def __init__(self):
+        self.temas = TEMAS
+        self.etag = '"v1"'
+        self.fallar = False
+        self.peticiones = []
+
+    def __call__(self, url, etag=None, last_modified=None, timeout=15, stream=False):
+        self.peticiones.append(etag)
+        if self.fallar:
+            raise ConnectionError("timeout")
+        if etag == self.etag:
+            return RespuestaFalsa(304)
+        return RespuestaFalsa(200, "<html></html>", {"ETag": self.etag})
+
+@pytest.fixture
+def bd(monkeypatch):
+    """Sustituye las escrituras en base de datos del escáner y registra las llamadas"""
+    llamadas = []
+    monkeypatch.setattr(scanner, "_validadores_http", {})
+    monkeypatch.setattr(scanner, "_validadores_pendientes", {})
+    monkeypatch.setattr(scanner, "_huellas_temas", {})
+    monkeypatch.setattr(scanner, "guardar_validadores_http", lambda *a: llamadas.append(("validadores", *a)))
+    monkeypatch.setattr(scanner, "guardar_huella_temas", lambda *a: llamadas.append(("huella", *a)))
+    monkeypatch.setattr(scanner, "tocar_temas_visibles", lambda medio_id: llamadas.append(("tocar", medio_id)))
+    monkeypatch.setattr(scanner, "guardar_temas", lambda medio_id, temas: llamadas.append(("guardar", list(temas))) or {
+        "insertados": len(temas), "refrescados": 0, "ocultados": 0, "momento": None,
+        "aparecidos": [], "desaparecidos": []
+    })
+    monkeypatch.setattr(scanner.cache, "invalidar_medio", lambda medio_id=None: None)
+    return llamadas
+
+@pytest.fixture
+def portada(monkeypatch):
+    portada = Portada()
+    monkeypatch.setattr(scanner, "get_condicional", portada)
+    monkeypatch.setattr(scanner, "get_selector", lambda dominio: (None, True))
+    monkeypatch.setattr(scanner, "resolver_enlaces",
+                        lambda dominio, html, tipo, selector_forzado=None, parcial=False: ("a", list(portada.temas)))
+    return portada
+
+def escanear():
+    temas = scanner.obtener_temas_de_web(1, "https://medio.es/", "propio")
+    return scanner.guardar_temas_medio(1, temas)
+
+def test_validadores_se_guardan_solo_al_confirmar_la_lista(bd, portada):
+    assert escanear() is not None
+    assert scanner._validadores_http == {}
+    assert escanear() is None
+    assert scanner._validadores_http == {1: ('"v1"', None)}
+    assert escanear() is None
+    assert portada.peticiones == [None, None, '"v1"']
+
+def test_fallo_de_descarga_olvida_los_validadores(bd, portada):
+    escanear()
+    escanear()
+    assert scanner._validadores_http == {1: ('"v1"', None)}
+
+    portada.fallar = True
+    escanear()
+    assert scanner._validadores_http == {}
+    assert ("validadores", 1, None, None) in bd
+
+    # La portada no ha cambiado, pero sin validadores no hay 304 y los temas se vuelven a comparar
+    portada.fallar = False
+    escanear()
+    assert portada.peticiones[-1] is None
+    assert bd[-1] == ("validadores", 1, '"v1"', None)
+
+def test_lista_vacia_olvida_los_validadores(bd, portada):
+    escanear()
+    escanear()
+
+    # La portada cambia y sale vacía (selector roto)
+    portada.temas, portada.etag = [], '"v2"'
+    assert escanear() is not None
+    assert scanner._validadores_http == {}
+    assert ("validadores", 1, None, None) in bd
+
+    portada.temas = TEMAS
+    assert escanear() is not None
+    assert portada.peticiones[-1] is None
+    assert ("guardar", TEMAS) in bd[-3:]
+
+def test_lista_distinta_olvida_los_validadores(bd, portada):
+    escanear()
+    escanear()
+    portada.temas, portada.etag = TEMAS[:1], '"v2"'
+    assert escanear() is not None
+    assert scanner._validadores_http == {}
+    assert escanear() is None
+    assert portada.peticiones[-1] is None
+    assert scanner._validadores_http == {1: ('"v2"', None)}
+
+def test_fallo_no_escribe_nada(bd):
+    scanner.guardar_temas_medio(1, TEMAS)
+    del bd[:]
+    assert scanner.guardar_temas_medio(1, scanner.FALLO) is None
+    assert bd == []
+    assert scanner._huellas_temas[1] == scanner.huella_temas(TEMAS)
+
+def test_lista_vacia_borra_la_huella(bd):
+    scanner.guardar_temas_medio(1, TEMAS)
+    scanner.guardar_temas_medio(1, [])
+    assert 1 not in scanner._huellas_temas
+    assert ("huella", 1, None) in bd
+
+    # La misma lista de antes vuelve a escribirse y a mostrar sus temas
+    assert scanner.guardar_temas_medio(1, TEMAS) is not None
+    assert bd[-2:] == [("guardar", TEMAS), ("huella", 1, scanner.huella_temas(TEMAS))]
@@ -0,0 +1,59 @@
+import time
+import logging
+
+from config import Config, configurar_logging
+from models.esquema import asegurar_esquema
+from models.escaneo import (adquirir_lock_escaner, tomar_siguiente_escaneo, finalizar_escaneo,
+                            recuperar_escaneos_huerfanos)
+from services.scanner import TAREAS, init_scheduler
+
+logger = logging.getLogger("worker")
+
+def esperar_lock():
+    """Bloquea hasta ser el único worker de escaneo del clúster"""
+    while True:
+        conn = adquirir_lock_escaner()
+        if conn:
+            return conn
+        logger.info("Otro worker tiene el lock de escaneo; reintentando más tarde")
+        time.sleep(Config.WORKER_ESPERA_LOCK)
+
+def ejecutar_escaneo(escaneo):
+    tarea = TAREAS.get(escaneo['tipo'])
+    if not tarea:
+        finalizar_escaneo(escaneo['id'], error=f"Tipo de escaneo desconocido: {escaneo['tipo']}")
+        return
+    logger.info(f"Ejecutando escaneo {escaneo['id']} ({escaneo['tipo']})")
+    try:
+        resultado = tarea()
+    except Exception as e:
+        logger.exception(f"Escaneo {escaneo['id']} fallido")
+        finalizar_escaneo(escaneo['id'], error=str(e))
+    else:
+        finalizar_escaneo(escaneo['id'], resultado=resultado)
+
+def main():
+    configurar_logging(Config.SCANNER_LOG)
+    asegurar_esquema()
+    conn_lock = esperar_lock()
+    huerfanos = recuperar_escaneos_huerfanos()
+    if huerfanos:
+        logger.warning(f"{huerfanos} escaneos interrumpidos marcados como error")
+
+    scheduler = init_scheduler()
+    scheduler.start()
+    logger.info("✅ Worker de escaneo iniciado")
+
+    try:
+        while True:
+            escaneo = tomar_siguiente_escaneo()
+            if escaneo:
+                ejecutar_escaneo(escaneo)
+            else:
+                time.sleep(Config.WORKER_INTERVALO_SONDEO)
+    finally:
+        scheduler.shutdown(wait=False)
+        conn_lock.close()
+
+if __name__ == "__main__":
+    main()